@@ -1,7 +1,11 @@
 import os
+import sys
 import argparse
 import subprocess
-from pgs import PGSParser
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from pgs import PGSParser, write_rgba_frames
 from ffprobe import FFProbe
 from pathlib import Path
 
@@ -41,21 +45,55 @@ def run_ffmpeg(ffmpeg_path: str, *commands, pipe_in: bytes | None = None) -> byt
 
 	return ffmpeg.stdout
 
-def dump_images_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path):
+def get_pgs_streams(input_file_path, ffprobe_path) -> list:
+	return [stream for stream in FFProbe(ffprobe_path=ffprobe_path, file_name=input_file_path)['streams'] if stream['codec_name'] == 'hdmv_pgs_subtitle']
+
+def extract_pgs_streams(input_file_path, stream_outputs: dict[int, str], ffmpeg_path):
+	"""Extracts every stream index -> output path pair in a single ffmpeg run so the input only gets read once."""
+	args = ['-i', input_file_path]
+	for stream_index, output_path in stream_outputs.items():
+		args.extend(('-map', f'0:{stream_index}', '-c', 'copy', '-f', 'sup', output_path))
+	run_ffmpeg(ffmpeg_path, *args)
+
+def dump_images_from_sup(sup_path, output_dir_path, jobs: int = 1):
+	PGSParser.read_from_file(sup_path).save_images(output_dir_path, workers=jobs)
+
+def dump_images_from_file_single_pass(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path, jobs: int = 1):
+	streams = get_pgs_streams(input_file_path, ffprobe_path)
+	if not streams:
+		return
+
+	with tempfile.TemporaryDirectory() as temp_dir:
+		# extract all the streams at once
+		sup_paths = {stream['index']: os.path.join(temp_dir, f'{stream["index"]}.sup') for stream in streams}
+		print(f'extracting {len(streams)} PGS streams from "{input_file_path}"')
+		extract_pgs_streams(input_file_path, sup_paths, ffmpeg_path)
+
+		# then parse and dump them concurrently, one process per stream, each saving its images with jobs processes
+		with ProcessPoolExecutor(max_workers=len(streams)) as executor:
+			futures = []
+			for stream_index, sup_path in sup_paths.items():
+				output_dir_path_for_sub = uniquify_file_name(f'{output_dir_path} - {stream_index}')
+				os.mkdir(output_dir_path_for_sub)
+				print(f'dumping stream {stream_index} to "{output_dir_path_for_sub}"')
+				futures.append(executor.submit(dump_images_from_sup, sup_path, output_dir_path_for_sub, jobs))
+			for future in futures:
+				future.result()
+
+def dump_images_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path, jobs: int = 1, single_pass: bool = False):
 	output_dir_path = os.path.join(output_dir_path, Path(input_file_path).stem)
 
 	if Path(input_file_path).suffix == '.sup':
-		# read the subtitle contents
-		with open(input_file_path, 'rb') as f:
-			data = f.read()
-			# parse it
-			parsed = PGSParser.read_from_bytes(data)
-
-			# dumps all the images
-			output_dir_path = uniquify_file_name(output_dir_path)
-			os.mkdir(output_dir_path)
-			print(f'dumping all images from "{input_file_path}" to "{output_dir_path}"')
-			parsed.save_images(output_dir_path)
+		# parse the subtitle contents
+		parsed = PGSParser.read_from_file(input_file_path)
+
+		# dumps all the images
+		output_dir_path = uniquify_file_name(output_dir_path)
+		os.mkdir(output_dir_path)
+		print(f'dumping all images from "{input_file_path}" to "{output_dir_path}"')
+		parsed.save_images(output_dir_path, workers=jobs)
+	elif single_pass:
+		dump_images_from_file_single_pass(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path, jobs)
 	else:
 		# else ffprobe it for streams and dump subs when found
 		for stream in FFProbe(ffprobe_path=ffprobe_path, file_name=input_file_path)['streams']:
@@ -69,10 +107,21 @@ def dump_images_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg
 			output_dir_path_for_sub = uniquify_file_name(f'{output_dir_path} - {stream_index}')
 			os.mkdir(output_dir_path_for_sub)
 			print(f'dumping stream {stream_index} to "{output_dir_path_for_sub}"')
-			PGSParser.read_from_bytes(sub_data).save_images(output_dir_path_for_sub)
+			PGSParser.read_from_bytes(sub_data).save_images(output_dir_path_for_sub, workers=jobs)
 
-def dump_sups_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path):
+def dump_sups_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path, single_pass: bool = False):
 	output_dir_path = os.path.join(output_dir_path, Path(input_file_path).stem)
+	if single_pass:
+		# extract every stream straight to it's file in one go
+		output_file_paths = {}
+		for stream in get_pgs_streams(input_file_path, ffprobe_path):
+			stream_index = stream['index']
+			output_file_paths[stream_index] = uniquify_file_name(f'{output_dir_path} - {stream_index}.sup')
+			print(f'dumping PGS stream {stream_index} to "{output_file_paths[stream_index]}"')
+		if output_file_paths:
+			extract_pgs_streams(input_file_path, output_file_paths, ffmpeg_path)
+		return
+
 	# scan the file with ffprobe
 	for stream in FFProbe(ffprobe_path=ffprobe_path, file_name=input_file_path)['streams']:
 		if stream['codec_name'] != 'hdmv_pgs_subtitle':
@@ -87,6 +136,45 @@ def dump_sups_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg_p
 		with open(output_file_path, 'wb') as f:
 			f.write(sub_data)
 		
+def dump_frames(sub_source, output_file, fps: Fraction):
+	"""Writes the raw RGBA frames of a PGS stream (path or bytes) to an open binary file."""
+	size = None
+	def display_sets():
+		nonlocal size
+		for ds in PGSParser.iter_display_sets(sub_source):
+			size = size or (ds.pcs.width, ds.pcs.height)
+			yield ds
+	frame_count = write_rgba_frames(display_sets(), output_file, fps)
+	if size is not None:
+		print(f'wrote {frame_count} frames, read them with: ffmpeg -f rawvideo -pix_fmt rgba -s {size[0]}x{size[1]} -r {fps} -i <frames>', file=sys.stderr)
+
+def dump_frames_from_file(input_file_path, output_dir_path, ffprobe_path, ffmpeg_path, fps: Fraction):
+	# "-" writes the frames of the first stream to stdout, for piping into ffmpeg
+	to_stdout = output_dir_path == '-'
+	if not to_stdout:
+		output_dir_path = os.path.join(output_dir_path, Path(input_file_path).stem)
+
+	if Path(input_file_path).suffix == '.sup':
+		if to_stdout:
+			dump_frames(input_file_path, sys.stdout.buffer, fps)
+			return
+		output_file_path = uniquify_file_name(f'{output_dir_path}.rgba')
+		print(f'dumping frames from "{input_file_path}" to "{output_file_path}"')
+		with open(output_file_path, 'wb') as f:
+			dump_frames(input_file_path, f, fps)
+		return
+
+	for stream in get_pgs_streams(input_file_path, ffprobe_path):
+		stream_index = stream['index']
+		sub_data = run_ffmpeg(ffmpeg_path, '-i', input_file_path, '-map',f'0:{stream_index}','-c','copy', '-f', 'sup', '-')
+		if to_stdout:
+			dump_frames(sub_data, sys.stdout.buffer, fps)
+			return
+		output_file_path = uniquify_file_name(f'{output_dir_path} - {stream_index}.rgba')
+		print(f'dumping frames of stream {stream_index} to "{output_file_path}"')
+		with open(output_file_path, 'wb') as f:
+			dump_frames(sub_data, f, fps)
+
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(
 		formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -103,15 +191,24 @@ if __name__ == '__main__':
 			"\tinput.mkv images ./out_images",
 			"",
 			"\tdump all images out of a mkv:",
-			"\tinput.sup images ./out_images"
+			"\tinput.sup images ./out_images",
+			"",
+			"\tdump all images out of a mkv while only reading it once:",
+			"\tinput.mkv images ./out_images --single-pass",
+			"",
+			"\tpipe the rendered subtitle frames of a sup into ffmpeg:",
+			"\tinput.sup frames - --fps 24000/1001 | ffmpeg -f rawvideo -pix_fmt rgba -s 1920x1080 -r 24000/1001 -i - out.mkv"
 		))
 	)
 
 	parser.add_argument('input_file', help='The input file to use.')
-	parser.add_argument('what_to_dump', choices=('sup','images'), help='What to dump from the input.')
+	parser.add_argument('what_to_dump', choices=('sup','images','frames'), help='What to dump from the input.')
 	parser.add_argument('output_dir', nargs='?', default=None, help='Where to dump the output.')
 	parser.add_argument('--ffmpeg', default=None, help='The path to ffmpeg', type=str)
 	parser.add_argument('--ffprobe', default=None, help='The path to ffprobe', type=str)
+	parser.add_argument('--jobs', '-j', default=1, help='The amount of processes used to save images', type=int)
+	parser.add_argument('--fps', default=Fraction(24000, 1001), help='The frame rate of the frames dump, like 24000/1001 or 25.', type=Fraction)
+	parser.add_argument('--single-pass', action='store_true', help='Extract every PGS stream with a single ffmpeg run and process them concurrently instead of reading the input once per stream.')
 	args = vars(parser.parse_args())
 	
 	# check if input file exists
@@ -129,11 +226,13 @@ if __name__ == '__main__':
 				output_dir = './out'
 			case 'images':
 				output_dir = './out_images'
+			case 'frames':
+				output_dir = './out_frames'
 			case _:
 				raise ValueError('unknown dump_action')
 	
 	# create output dir if it doesn't exist
-	if not Path(output_dir).is_dir():
+	if output_dir != '-' and not Path(output_dir).is_dir():
 		os.mkdir(output_dir)
 
 	# check ffmpeg path
@@ -154,8 +253,10 @@ if __name__ == '__main__':
 	# get workin'
 	match what_to_dump:
 		case 'sup':
-			dump_sups_from_file(input_file, output_dir, ffprobe_path, ffmpeg_path)
+			dump_sups_from_file(input_file, output_dir, ffprobe_path, ffmpeg_path, args['single_pass'])
 		case 'images':
-			dump_images_from_file(input_file, output_dir, ffprobe_path, ffmpeg_path)
+			dump_images_from_file(input_file, output_dir, ffprobe_path, ffmpeg_path, args['jobs'], args['single_pass'])
+		case 'frames':
+			dump_frames_from_file(input_file, output_dir, ffprobe_path, ffmpeg_path, args['fps'])
 		case _:
 			raise ValueError('unknown dump_action')
\ No newline at end of file
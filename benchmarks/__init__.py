@@ -0,0 +1,2 @@
+from .synthetic import make_pgs_file
+from .stages import BENCHMARK_STAGES, BenchmarkResult, MemoryResult, run_stage, measure_memory
@@ -0,0 +1,171 @@
+import gc
+import io
+import tempfile
+import time
+import tracemalloc
+import typing
+from pgs import *
+from pgs import pgs_parser
+
+class BenchmarkResult:
+	stage: str
+	seconds: float
+	"""Best time of all the repeats."""
+	bytes: int
+	"""Amount of PGS data (rle data for the codec stages) processed by the stage."""
+	segments: int
+	objects: int
+	peak_memory: int
+	"""Peak amount of memory allocated while running the stage once, in bytes."""
+
+	def __init__(self, stage: str, seconds: float, bytes: int, segments: int, objects: int, peak_memory: int):
+		self.stage = stage
+		self.seconds = seconds
+		self.bytes = bytes
+		self.segments = segments
+		self.objects = objects
+		self.peak_memory = peak_memory
+
+	@property
+	def mb_per_s(self) -> float:
+		return self.bytes / 1_000_000 / self.seconds if self.seconds else 0.0
+
+	@property
+	def segments_per_s(self) -> float:
+		return self.segments / self.seconds if self.seconds else 0.0
+
+	@property
+	def objects_per_s(self) -> float:
+		return self.objects / self.seconds if self.seconds else 0.0
+
+	def to_dict(self) -> dict:
+		return {
+			'seconds': self.seconds,
+			'bytes': self.bytes,
+			'segments': self.segments,
+			'objects': self.objects,
+			'mb_per_s': self.mb_per_s,
+			'segments_per_s': self.segments_per_s,
+			'objects_per_s': self.objects_per_s,
+			'peak_memory': self.peak_memory,
+		}
+
+class BenchmarkData:
+	"""Everything the stages need, prepared before hand so it isn't timed."""
+	pgs_file: PGSFile
+	data: bytes
+	segments: int
+	objects: list[ODSSegment]
+	indexes: list
+	rle_bytes: int
+
+	def __init__(self, pgs_file: PGSFile):
+		self.pgs_file = pgs_file
+		self.data = pgs_file.write()
+		# count the segments as written, so ODS fragments are included
+		self.segments = 0
+		with PGSBufferIO(self.data) as reader:
+			while reader.can_read():
+				(_, _, _, _, size) = reader.unpack(pgs_parser.PGS_HEADER_LAYOUT)
+				reader.seek(size, io.SEEK_CUR)
+				self.segments += 1
+		self.objects = [ods for ds in pgs_file.display_sets for ods in ds.ods.values()]
+		self.indexes = [ods.get_indexes() for ods in self.objects]
+		self.rle_bytes = sum(len(ods.rle_data) for ods in self.objects)
+
+def bench_decode_rle(data: BenchmarkData):
+	for ods in data.objects:
+		decode_pgs_rle_array(ods.rle_data, ods.width, ods.height)
+	return (data.rle_bytes, 0, len(data.objects))
+
+def bench_encode_rle(data: BenchmarkData):
+	for indexes in data.indexes:
+		encode_pgs_rle_array(indexes)
+	return (data.rle_bytes, 0, len(data.objects))
+
+def bench_parse(data: BenchmarkData):
+	PGSParser.read_from_bytes(data.data)
+	return (len(data.data), data.segments, len(data.objects))
+
+def bench_write(data: BenchmarkData):
+	data.pgs_file.write()
+	return (len(data.data), data.segments, len(data.objects))
+
+def bench_save_images(data: BenchmarkData):
+	with tempfile.TemporaryDirectory() as out_dir:
+		data.pgs_file.save_images(out_dir)
+	return (len(data.data), data.segments, len(data.objects))
+
+BENCHMARK_STAGES: dict[str, typing.Callable[[BenchmarkData], tuple[int, int, int]]] = {
+	'decode_rle': bench_decode_rle,
+	'encode_rle': bench_encode_rle,
+	'parse': bench_parse,
+	'write': bench_write,
+	'save_images': bench_save_images,
+}
+
+def run_stage(name: str, data: BenchmarkData, repeat: int = 3) -> BenchmarkResult:
+	stage = BENCHMARK_STAGES[name]
+
+	# time it without tracemalloc since it slows allocations down a lot
+	best = None
+	for _ in range(max(1, repeat)):
+		gc.collect()
+		start = time.perf_counter()
+		(processed_bytes, segments, objects) = stage(data)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+
+	# then run it once more to get the peak memory
+	gc.collect()
+	tracemalloc.start()
+	try:
+		stage(data)
+		(_, peak_memory) = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+
+	return BenchmarkResult(name, best, processed_bytes, segments, objects, peak_memory)
+
+class MemoryResult:
+	display_sets: int
+	retained_bytes: int
+	"""Memory held by a parsed PGSFile."""
+	rle_bytes: int
+	"""Part of the retained memory that is rle data, it doesn't depend on how the data model is laid out."""
+
+	def __init__(self, display_sets: int, retained_bytes: int, rle_bytes: int):
+		self.display_sets = display_sets
+		self.retained_bytes = retained_bytes
+		self.rle_bytes = rle_bytes
+
+	@property
+	def bytes_per_display_set(self) -> float:
+		return self.retained_bytes / self.display_sets if self.display_sets else 0.0
+
+	@property
+	def overhead_per_display_set(self) -> float:
+		"""Retained bytes per display set without the rle data, this is the cost of the object model itself."""
+		return (self.retained_bytes - self.rle_bytes) / self.display_sets if self.display_sets else 0.0
+
+	def to_dict(self) -> dict:
+		return {
+			'display_sets': self.display_sets,
+			'retained_bytes': self.retained_bytes,
+			'rle_bytes': self.rle_bytes,
+			'bytes_per_display_set': self.bytes_per_display_set,
+			'overhead_per_display_set': self.overhead_per_display_set,
+		}
+
+def measure_memory(data: BenchmarkData) -> MemoryResult:
+	"""Measures how much memory a parsed file keeps alive."""
+	gc.collect()
+	tracemalloc.start()
+	try:
+		before = tracemalloc.get_traced_memory()[0]
+		parsed = PGSParser.read_from_bytes(data.data)
+		gc.collect()
+		retained = tracemalloc.get_traced_memory()[0] - before
+	finally:
+		tracemalloc.stop()
+	return MemoryResult(len(parsed.display_sets), retained, data.rle_bytes)
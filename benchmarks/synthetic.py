@@ -0,0 +1,46 @@
+import numpy as np
+from pgs import *
+
+def make_object_indexes(rng: np.random.Generator, width: int, height: int, run_length: int, colors: int) -> np.ndarray:
+	"""Makes a (height, width) index image made of runs that are run_length pixels long on average.
+	Shorter runs make the rle data bigger which means more ODS fragments."""
+	runs_per_line = max(1, width // max(1, run_length))
+	# random run boundaries for every line
+	boundaries = np.sort(rng.integers(1, width, size=(height, runs_per_line - 1)), axis=1) if runs_per_line > 1 else np.zeros((height, 0), dtype=np.int64)
+	run_ids = np.zeros((height, width), dtype=np.int64)
+	rows = np.repeat(np.arange(height), boundaries.shape[1])
+	np.add.at(run_ids, (rows, boundaries.reshape(-1)), 1)
+	run_ids = np.cumsum(run_ids, axis=1)
+	# palette 0 is the transparent background and shows up a lot
+	run_colors = rng.integers(0, colors, size=(height, runs_per_line))
+	return np.take_along_axis(run_colors, run_ids, axis=1).astype(np.uint8)
+
+def make_pgs_file(display_sets: int = 100, width: int = 1920, height: int = 150, objects: int = 1, run_length: int = 8, colors: int = 16, screen: tuple[int, int] = (1920, 1080), seed: int = 0) -> PGSFile:
+	"""Makes a synthetic PGS stream where every display set starts a new epoch with its own palette and objects."""
+	if not 1 <= objects <= 2:
+		raise ValueError('PCS are limited to 2 presentation objects at once.')
+	rng = np.random.default_rng(seed)
+	(screen_width, screen_height) = screen
+
+	palette = [PDSPalette(0, 16, 128, 128, 0)]
+	for i in range(1, colors):
+		palette.append(PDSPalette(i, int(rng.integers(16, 236)), int(rng.integers(16, 241)), int(rng.integers(16, 241)), int(rng.integers(0, 256))))
+
+	segments: list[PGSSegment] = []
+	for ds_index in range(display_sets):
+		pts = ds_index * 90000
+		pcs_objects = []
+		windows = []
+		ods_segments = []
+		for object_id in range(objects):
+			y = screen_height - (object_id + 1) * height
+			windows.append(WDSWindow(object_id, 0, y, width, height))
+			pcs_objects.append(PCSObject(object_id, object_id, 0, y))
+			indexes = make_object_indexes(rng, width, height, run_length, colors)
+			ods_segments.append(ODSSegment(pts, pts, object_id, 0, ODSPositionFlag.FIRST_AND_LAST, width, height, encode_pgs_rle_array(indexes)))
+		segments.append(PCSSegment(pts, pts, screen_width, screen_height, 0x10, ds_index, PCSState.EPOCH_START, False, 0, pcs_objects))
+		segments.append(WDSSegment(pts, pts, windows))
+		segments.append(PDSSegment(pts, pts, 0, 0, palette))
+		segments.extend(ods_segments)
+		segments.append(ENDSegment(pts, pts))
+	return PGSFile(segments)
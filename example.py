@@ -33,6 +33,9 @@ FIX_IMAGES_WITH_FFMPEG_AND_MAGIC = False
 TEMP_DIR = path.join('.','temp')
 OUT_DIR = path.join('.', 'out')
 
+# fix_sub copies every object into every display set it's shown in, so each pool worker only encodes each unique image once
+OBJECT_STORE = PGSObjectStore()
+
 @dataclass
 class SubToFix():
 	input_index: int
@@ -98,16 +101,13 @@ def fix_images(ds: PGSDisplaySet, ds_palette: np.ndarray[any]) -> PGSDisplaySet:
 	try:
 		for ods in ds.ods.values():
 			# get the image
-			with ods.get_image(ds_palette) as temp_img:
-				with temp_img.convert('RGBA') as temp_img2:
-					img_data = np.array(temp_img2, dtype=np.uint8)
-
-					with BytesIO() as buf:
-						temp_img.save(buf, format='png')
-						buf.seek(0)
-						img_file_bytes = buf.read()
+			img_data = ods.to_rgba(ds_palette)
 
 			if FIX_IMAGES_WITH_FFMPEG_AND_MAGIC:
+				with BytesIO() as buf, Image.fromarray(img_data, 'RGBA') as temp_img:
+					temp_img.save(buf, format='png')
+					img_file_bytes = buf.getvalue()
+
 				# get ymax
 				ymax_cmd = ['-i',"-",'-vf','format=rgba,scale=out_range=full,signalstats,metadata=print:file=-','-f','null','-']
 				ffmpeg_metadata = run_ffmpeg(*ymax_cmd, pipe_in=img_file_bytes)
@@ -197,44 +197,17 @@ def fix_images(ds: PGSDisplaySet, ds_palette: np.ndarray[any]) -> PGSDisplaySet:
 		
 def fix_palette(ds: PGSDisplaySet):
 	try:
-		# full transparency should always be the first thing to appear in the palette
-		final_palette_bytes = b'\x00'*4
-		final_palette_lookup = {
-			(0,0,0,0): 0
-		}
+		# one palette for every object of the display set, full transparency always is the first entry
+		objects = list(ds.ods.values())
+		(indexes, pds_palettes) = quantize_rgba([ods.decoded_data for ods in objects], reduce=True)
 
-		for ods in ds.ods.values():
-			# create the pallete thing for PIL and make the lookup table for the conversion
-			img_data = ods.decoded_data
-			temp_palette = np.unique(img_data.reshape(-1,4), axis=0)
-			for p in [(*p,) for p in temp_palette.tolist()]:
-				if p not in final_palette_lookup:
-					final_palette_lookup[p] = len(final_palette_lookup)
-					final_palette_bytes += bytes(p)
-			
-			# turn the img data into an index list
-			img_data = img_data.tolist()
-			for line in img_data:
-				for i,p in enumerate(line):
-					line[i] = final_palette_lookup[(*p,)]
-			img_data = np.array(img_data, dtype=np.uint8)
-
-			img = Image.fromarray(img_data, 'P')
-			img.putpalette(final_palette_bytes, rawmode='RGBA')
-			if ods.id == 0:
-				pass
-		
+		for ods, img_data in zip(objects, indexes):
 			# encode the image
-			img_bytes = img.tobytes()
-			img_bytes_lines= [img_bytes[i * img.width: (i+1) * img.width] for i in range(img.height)]
-			ods.rle_data = encode_pgs_rle(img_bytes_lines)
-			ods.width = img.width
-			ods.height = img.height
+			ods.rle_data = OBJECT_STORE.encode(img_data)
+			ods.width = img_data.shape[1]
+			ods.height = img_data.shape[0]
 
 		# update the palette definition
-		pds_palettes: list[PDSPalette] = []
-		for p,i in final_palette_lookup.items():
-			pds_palettes.append(pil_color_to_pds_palette(p, i))
 		ds.pcs.palette_id = 0
 		ds.pcs.is_palette_only_update = False
 		ds.pds = {0: PDSSegment(ds.pcs.pts, ds.pcs.dts, ds.pcs.palette_id, 1, pds_palettes)}
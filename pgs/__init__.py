@@ -1,7 +1,10 @@
-from .pgs_io import PGSIO
+from .pgs_io import PGSIO, PGSBufferIO, PGSStreamIO, map_file
 from .pgs_exceptions import PGSParserException, PGSIOException
-from .pgs_rle_parser import encode_pgs_rle, decode_pgs_rle
-from .pgs_image_utils import ycbcr_to_rgb, rgb_to_ycbcr, segment_to_pil, pil_color_to_pds_palette
+from .pgs_rle_parser import encode_pgs_rle, encode_pgs_rle_array, decode_pgs_rle, decode_pgs_rle_array
+from .pgs_image_utils import ycbcr_to_rgb, rgb_to_ycbcr, segment_to_pil, pil_color_to_pds_palette, indexes_to_image
+from .pgs_image_utils import PGSColorMatrix, ycbcr_to_rgb_array, rgb_to_ycbcr_array, rgba_to_pds_palette_array, quantize_rgba
+from .pgs_cache import PGSImageCache
+from .pgs_object_store import PGSObjectStore
 
 from .pgs_parser import PGSSegment
 from .pgs_parser import PDSPalette, PDSSegment
@@ -9,4 +12,11 @@ from .pgs_parser import ODSPositionFlag, ODSSegment
 from .pgs_parser import PCSState, PCSObjectCrop, PCSObject, PCSSegment
 from .pgs_parser import WDSWindow, WDSSegment
 from .pgs_parser import ENDSegment
-from .pgs_parser import PGSDisplaySet, PGSParser, PGSFile, PGSContext
\ No newline at end of file
+from .pgs_parser import PGSDisplaySet, PGSParser, PGSWriter, PGSFile, PGSContext
+from .pgs_index import PGSIndex
+from .pgs_validator import PGSValidationFinding, validate_pgs
+from .pgs_timeline import PGSActiveObject, PGSTimelineEntry, PGSTimeline
+from .pgs_compositor import PGSCompositor
+from .pgs_frames import write_rgba_frames
+from .pgs_diff import PGSFieldDiff, PGSObjectDiff, PGSDisplaySetDiff, PGSDiff, diff_pgs, diff_display_sets
+from .pgs_pipeline import PGSObjectTransform, transform_objects
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import numpy as np
+import pgs
+
+import typing
+if typing.TYPE_CHECKING:
+	from .pgs_parser import ODSSegment, PDSSegment
+
+class PGSImageCache:
+	"""LRU cache for decoded ODS bitmaps and RGBA palettes.
+
+	Bitmaps are keyed by (width, height, id(rle_data)) and palettes by (pds.id, pds.version, id(palette_source)).
+	Objects that share their rle data, like the ones interned by a PGSObjectStore, share their cache entry too.
+	Entries keep a reference to the data they were made from so its id can't be reused by something else while it's cached.
+	Cached arrays are read only since they are shared by everyone that asks for them."""
+
+	max_bytes: int
+	"""The maximum amount of decoded bitmap data kept in the cache."""
+	max_palettes: int
+	"""The maximum amount of palettes kept in the cache."""
+	hits: int
+	misses: int
+	palette_hits: int
+	palette_misses: int
+
+	__bitmaps: OrderedDict[tuple, tuple[typing.Any, np.ndarray]]
+	__palettes: OrderedDict[tuple, tuple[typing.Any, np.ndarray]]
+	__size: int
+
+	def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_palettes: int = 64):
+		self.max_bytes = max_bytes
+		self.max_palettes = max_palettes
+		self.__bitmaps = OrderedDict()
+		self.__palettes = OrderedDict()
+		self.__size = 0
+		self.reset_stats()
+
+	@property
+	def size(self) -> int:
+		"""The amount of bytes used by the cached bitmaps."""
+		return self.__size
+
+	def reset_stats(self):
+		self.hits = 0
+		self.misses = 0
+		self.palette_hits = 0
+		self.palette_misses = 0
+
+	def clear(self):
+		self.__bitmaps.clear()
+		self.__palettes.clear()
+		self.__size = 0
+
+	def get_indexes(self, ods: 'ODSSegment') -> np.ndarray:
+		"""Gets the (height, width) palette index array of an ODS, decoding it if it isn't cached."""
+		key = (ods.width, ods.height, id(ods.rle_data))
+		entry = self.__bitmaps.get(key)
+		if entry is not None and entry[0] is ods.rle_data:
+			self.hits += 1
+			self.__bitmaps.move_to_end(key)
+			return entry[1]
+
+		self.misses += 1
+		decoded = pgs.decode_pgs_rle_array(ods.rle_data, ods.width, ods.height)
+		decoded.setflags(write=False)
+		
+		# don't flush the whole cache for something that won't fit anyway
+		if decoded.nbytes > self.max_bytes:
+			return decoded
+
+		self.__bitmaps[key] = (ods.rle_data, decoded)
+		self.__size += decoded.nbytes
+		while self.__size > self.max_bytes:
+			(_, (_, evicted)) = self.__bitmaps.popitem(last=False)
+			self.__size -= evicted.nbytes
+		return decoded
+
+	def get_palette(self, pds: 'PDSSegment') -> np.ndarray:
+		"""Gets the (256, 4) RGBA palette of a PDS, converting it if it isn't cached."""
+		key = (pds.id, pds.version, id(pds.palette_source))
+		entry = self.__palettes.get(key)
+		if entry is not None and entry[0] is pds.palette_source:
+			self.palette_hits += 1
+			self.__palettes.move_to_end(key)
+			return entry[1]
+
+		self.palette_misses += 1
+		palette = pgs.segment_to_pil(pds)
+		palette.setflags(write=False)
+
+		self.__palettes[key] = (pds.palette_source, palette)
+		while len(self.__palettes) > self.max_palettes:
+			self.__palettes.popitem(last=False)
+		return palette
@@ -0,0 +1,207 @@
+import numpy as np
+import pgs
+from .pgs_parser import PCSObject, ODSSegment, PDSSegment, WDSWindow, PGSDisplaySet, PGSContext
+
+Rect = tuple[int, int, int, int]
+"""x - y - width - height"""
+
+def _intersect(a: Rect, b: Rect) -> Rect | None:
+	x = max(a[0], b[0])
+	y = max(a[1], b[1])
+	right = min(a[0] + a[2], b[0] + b[2])
+	bottom = min(a[1] + a[3], b[1] + b[3])
+	if right <= x or bottom <= y:
+		return None
+	return (x, y, right - x, bottom - y)
+
+def _union(a: Rect, b: Rect) -> Rect:
+	x = min(a[0], b[0])
+	y = min(a[1], b[1])
+	return (x, y, max(a[0] + a[2], b[0] + b[2]) - x, max(a[1] + a[3], b[1] + b[3]) - y)
+
+def _merge_rects(rects: list[Rect]) -> list[Rect]:
+	"""Merges overlapping rectangles until none of them overlap, so no pixel gets drawn twice."""
+	merged: list[Rect] = []
+	for rect in rects:
+		while True:
+			for i, other in enumerate(merged):
+				if _intersect(rect, other) is not None:
+					rect = _union(rect, merged.pop(i))
+					break
+			else:
+				break
+		merged.append(rect)
+	return merged
+
+def _alpha_over(dst: np.ndarray, src: np.ndarray):
+	"""Blends straight alpha RGBA src over dst in place."""
+	src_alpha = src[..., 3:].astype(np.float32) / 255
+	dst_alpha = dst[..., 3:].astype(np.float32) / 255
+	out_alpha = src_alpha + dst_alpha * (1 - src_alpha)
+	with np.errstate(invalid='ignore', divide='ignore'):
+		colors = (src[..., :3] * src_alpha + dst[..., :3] * (dst_alpha * (1 - src_alpha))) / out_alpha
+	dst[..., :3] = np.where(out_alpha > 0, np.rint(colors), 0)
+	dst[..., 3:] = np.rint(out_alpha * 255)
+
+EMPTY_INDEX = 0x100
+"""Value of the index plane where no object is drawn, maps to the transparent entry appended to the palette."""
+
+class PGSCompositor:
+	"""Renders display sets to full frame RGBA images the way a player shows them.
+	The compositor follows the epochs of the stream through its own PGSContext, so display sets have to be rendered in order.
+	Objects are placed at their PCS position, cropped, clipped to their window and blended over each other in a canvas
+	that is reused from one display set to the next: only the windows whose content changed get redrawn.
+	The palette indexes shown on screen are kept as well, so when only the palette changes (fades, karaoke, palette only updates)
+	the new palette is applied to them with a single lookup instead of drawing the objects again."""
+	context: PGSContext
+	canvas: np.ndarray | None
+	"""(height, width, 4) RGBA frame of the last rendered display set. Gets overwritten by the next render."""
+	cache: 'pgs.PGSImageCache | None'
+	dirty_rects: list[Rect]
+	"""Areas of the canvas that changed in the last render."""
+	palette_only: bool
+	"""Whether the last render only applied a new palette to the index plane."""
+	__plane: np.ndarray | None
+	"""(height, width) palette index of every pixel of the canvas, EMPTY_INDEX where nothing is drawn."""
+	__signatures: dict[int, tuple]
+	__pds: PDSSegment | None
+	__blended_windows: set[int]
+	"""Windows where objects were blended over each other, the index plane can't represent them."""
+
+	def __init__(self, cache: 'pgs.PGSImageCache | None' = None):
+		self.cache = cache
+		self.reset()
+
+	def reset(self):
+		"""Forgets everything, the next render starts from an empty screen."""
+		self.context = PGSContext()
+		self.canvas = None
+		self.dirty_rects = []
+		self.palette_only = False
+		self.__plane = None
+		self.__signatures = {}
+		self.__pds = None
+		self.__blended_windows = set()
+
+	def render(self, display_set: PGSDisplaySet) -> np.ndarray:
+		"""Updates the state with the display set and returns the canvas showing it."""
+		self.context.update(display_set)
+		pcs = display_set.pcs
+		self.palette_only = False
+
+		if self.canvas is None or self.canvas.shape[:2] != (pcs.height, pcs.width):
+			self.canvas = np.zeros((pcs.height, pcs.width, 4), dtype=np.uint8)
+			self.__plane = np.full((pcs.height, pcs.width), EMPTY_INDEX, dtype=np.uint16)
+			self.__signatures = {}
+			self.__blended_windows = set()
+
+		windows = self.context.windows
+		pds = self.context.palettes.get(pcs.palette_id)
+		objects: dict[int, list[PCSObject]] = {window_id: [] for window_id in windows}
+		for obj in pcs.objects:
+			# objects that are in a window that doesn't exist can't be shown
+			if obj.window_id in objects:
+				objects[obj.window_id].append(obj)
+
+		signatures = {
+			window_id: self.__window_signature(window, objects[window_id])
+			for window_id, window in windows.items()
+		}
+
+		# both where a window was and where it is now need to be redrawn
+		dirty: list[Rect] = []
+		for window_id in signatures.keys() | self.__signatures.keys():
+			old = self.__signatures.get(window_id)
+			new = signatures.get(window_id)
+			if old == new:
+				continue
+			for signature in (old, new):
+				if signature is not None:
+					dirty.append(signature[0])
+		self.__signatures = signatures
+
+		palette_changed = pds is not self.__pds
+		self.__pds = pds
+		shown = [signature[0] for signature in signatures.values() if len(signature) > 1]
+		if palette_changed and pds is not None:
+			if not dirty and not self.__blended_windows:
+				self.__apply_palette(self.__get_palette(pds), shown, (0, 0, pcs.width, pcs.height))
+				return self.canvas
+			dirty += shown
+
+		screen = (0, 0, pcs.width, pcs.height)
+		self.dirty_rects = [rect for rect in (_intersect(rect, screen) for rect in _merge_rects(dirty)) if rect is not None]
+		if not self.dirty_rects:
+			return self.canvas
+
+		palette = self.__get_palette(pds) if pds is not None else None
+		for rect in self.dirty_rects:
+			(x, y, width, height) = rect
+			self.canvas[y:y + height, x:x + width] = 0
+			self.__plane[y:y + height, x:x + width] = EMPTY_INDEX
+			if palette is None:
+				continue
+			for window_id, window in windows.items():
+				window_rect = (window.x, window.y, window.width, window.height)
+				area = _intersect(rect, window_rect)
+				if area is None:
+					continue
+				# the window is drawn from scratch so only what gets drawn now can be blended
+				if area == _intersect(window_rect, screen):
+					self.__blended_windows.discard(window_id)
+				for obj in objects[window_id]:
+					ods = self.context.images.get(obj.object_id)
+					if ods is not None and self.__draw_object(obj, ods, palette, area):
+						self.__blended_windows.add(window_id)
+		return self.canvas
+
+	def __window_signature(self, window: WDSWindow, objects: list[PCSObject]) -> tuple:
+		"""Everything but the palette that changes what a window shows. Segments are compared by identity as the context replaces them when they get resent."""
+		rect = (window.x, window.y, window.width, window.height)
+		if not objects:
+			return (rect,)
+		return (rect, tuple(
+			(obj.object_id, self.context.images.get(obj.object_id), obj.x, obj.y,
+			(obj.crop.x, obj.crop.y, obj.crop.width, obj.crop.height) if obj.crop is not None else None)
+			for obj in objects
+		))
+
+	def __get_palette(self, pds: PDSSegment) -> np.ndarray:
+		"""The RGBA palette of the pds with a transparent entry at EMPTY_INDEX."""
+		palette = np.zeros((EMPTY_INDEX + 1, 4), dtype=np.uint8)
+		palette[:EMPTY_INDEX] = self.cache.get_palette(pds) if self.cache is not None else pgs.segment_to_pil(pds)
+		return palette
+
+	def __apply_palette(self, palette: np.ndarray, rects: list[Rect], screen: Rect):
+		"""Redraws rects from the index plane with a new palette."""
+		self.palette_only = True
+		self.dirty_rects = [rect for rect in (_intersect(rect, screen) for rect in _merge_rects(rects)) if rect is not None]
+		for (x, y, width, height) in self.dirty_rects:
+			np.take(palette, self.__plane[y:y + height, x:x + width], axis=0, out=self.canvas[y:y + height, x:x + width])
+
+	def __draw_object(self, obj: PCSObject, ods: ODSSegment, palette: np.ndarray, area: Rect) -> bool:
+		"""Draws the part of an object that falls in area, which is already clipped to the window of the object.
+		Returns whether the object got blended over something that was already drawn."""
+		# the crop is a rectangle of the object, shown at the position of the object
+		crop = (0, 0, ods.width, ods.height)
+		if obj.crop is not None:
+			crop = _intersect(crop, (obj.crop.x, obj.crop.y, obj.crop.width, obj.crop.height))
+			if crop is None:
+				return False
+		target = _intersect(area, (obj.x, obj.y, crop[2], crop[3]))
+		if target is None:
+			return False
+
+		(x, y, width, height) = target
+		src_x = crop[0] + x - obj.x
+		src_y = crop[1] + y - obj.y
+		indexes = ods.get_indexes(self.cache)[src_y:src_y + height, src_x:src_x + width]
+		src = np.take(palette, indexes, axis=0)
+		dst = self.canvas[y:y + height, x:x + width]
+		plane = self.__plane[y:y + height, x:x + width]
+		if (plane == EMPTY_INDEX).all():
+			dst[...] = src
+			plane[...] = indexes
+			return False
+		_alpha_over(dst, src)
+		return True
@@ -0,0 +1,211 @@
+import hashlib
+import typing
+import numpy as np
+import pgs
+from .pgs_parser import PCSObject, PCSSegment, WDSSegment, PDSSegment, ODSSegment, PGSDisplaySet
+
+class PGSFieldDiff:
+	"""A value that differs between two segments of matching display sets."""
+	segment: str
+	"""'pcs', 'wds', 'pds' or 'ods'."""
+	id: int | None
+	"""ID of the window, palette or object, None for the PCS."""
+	field: str
+	old: typing.Any
+	"""None when the old display set doesn't have the segment."""
+	new: typing.Any
+	"""None when the new display set doesn't have the segment."""
+
+	def __init__(self, segment: str, id: int | None, field: str, old, new):
+		self.segment = segment
+		self.id = id
+		self.field = field
+		self.old = old
+		self.new = new
+
+	def __repr__(self) -> str:
+		name = self.segment if self.id is None else f'{self.segment}[{self.id}]'
+		return f'{name}.{self.field}: {self.old!r} -> {self.new!r}'
+
+class PGSObjectDiff:
+	"""An object whose rle data differs between two matching display sets."""
+	id: int
+	old: ODSSegment
+	new: ODSSegment
+	changed_pixels: int | None
+	"""Amount of palette indexes that differ, 0 when only the encoding changed. None when the pixels weren't compared or the sizes differ."""
+	bounding_box: tuple[int, int, int, int] | None
+	"""x - y - width - height of the changed pixels, None when there are none or they weren't compared."""
+
+	def __init__(self, id: int, old: ODSSegment, new: ODSSegment, changed_pixels: int | None = None, bounding_box: tuple[int, int, int, int] | None = None):
+		self.id = id
+		self.old = old
+		self.new = new
+		self.changed_pixels = changed_pixels
+		self.bounding_box = bounding_box
+
+class PGSDisplaySetDiff:
+	"""Differences between two display sets shown at the same PTS, or a display set that only one of the files has."""
+	pts: int
+	old: PGSDisplaySet | None
+	"""None when the display set was added."""
+	new: PGSDisplaySet | None
+	"""None when the display set was removed."""
+	fields: list[PGSFieldDiff]
+	objects: list[PGSObjectDiff]
+
+	def __init__(self, pts: int, old: PGSDisplaySet | None, new: PGSDisplaySet | None):
+		self.pts = pts
+		self.old = old
+		self.new = new
+		self.fields = []
+		self.objects = []
+
+	@property
+	def added(self) -> bool:
+		return self.old is None
+
+	@property
+	def removed(self) -> bool:
+		return self.new is None
+
+	def __bool__(self) -> bool:
+		return self.old is None or self.new is None or bool(self.fields) or bool(self.objects)
+
+class PGSDiff:
+	"""Result of diff_pgs."""
+	matched: int
+	"""Amount of display sets found in both files, changed or not."""
+	display_sets: list[PGSDisplaySetDiff]
+	"""Display sets that changed, were added or were removed, in PTS order."""
+
+	def __init__(self):
+		self.matched = 0
+		self.display_sets = []
+
+	@property
+	def added(self) -> list[PGSDisplaySetDiff]:
+		return [diff for diff in self.display_sets if diff.added]
+
+	@property
+	def removed(self) -> list[PGSDisplaySetDiff]:
+		return [diff for diff in self.display_sets if diff.removed]
+
+	@property
+	def changed(self) -> list[PGSDisplaySetDiff]:
+		return [diff for diff in self.display_sets if not diff.added and not diff.removed]
+
+	def __bool__(self) -> bool:
+		"""True when the files differ."""
+		return bool(self.display_sets)
+
+def _get_display_sets(source) -> typing.Iterator[PGSDisplaySet]:
+	if isinstance(source, pgs.PGSFile):
+		return iter(source.display_sets)
+	if isinstance(source, (str, bytes, bytearray, memoryview)) or hasattr(source, 'read') or hasattr(source, '__fspath__'):
+		return pgs.PGSParser.iter_display_sets(source)
+	return iter(source)
+
+def diff_pgs(old, new, compare_pixels: bool = True) -> PGSDiff:
+	"""Compares two PGS streams display set by display set.
+	old and new can be PGSFile objects, iterables of display sets, or anything PGSParser.iter_display_sets reads, in which case they get streamed.
+	Display sets are matched on their PTS with a single merge pass over both streams, so both have to be in PTS order.
+	Objects are compared with a hash of their rle data and only decoded when the hashes differ and compare_pixels is set."""
+	result = PGSDiff()
+	olds = _get_display_sets(old)
+	news = _get_display_sets(new)
+	old_ds = next(olds, None)
+	new_ds = next(news, None)
+	while old_ds is not None or new_ds is not None:
+		if new_ds is None or (old_ds is not None and old_ds.pcs.pts < new_ds.pcs.pts):
+			result.display_sets.append(PGSDisplaySetDiff(old_ds.pcs.pts, old_ds, None))
+			old_ds = next(olds, None)
+		elif old_ds is None or new_ds.pcs.pts < old_ds.pcs.pts:
+			result.display_sets.append(PGSDisplaySetDiff(new_ds.pcs.pts, None, new_ds))
+			new_ds = next(news, None)
+		else:
+			result.matched += 1
+			diff = diff_display_sets(old_ds, new_ds, compare_pixels)
+			if diff:
+				result.display_sets.append(diff)
+			old_ds = next(olds, None)
+			new_ds = next(news, None)
+	return result
+
+def diff_display_sets(old: PGSDisplaySet, new: PGSDisplaySet, compare_pixels: bool = True) -> PGSDisplaySetDiff:
+	"""Compares two display sets, regardless of their PTS."""
+	diff = PGSDisplaySetDiff(new.pcs.pts, old, new)
+	_diff_pcs(diff.fields, old.pcs, new.pcs)
+	_diff_wds(diff.fields, old.wds, new.wds)
+	_diff_segments(diff.fields, 'pds', old.pds, new.pds, _diff_pds)
+	_diff_segments(diff.fields, 'ods', old.ods, new.ods, _diff_ods_header)
+	for id in old.ods.keys() & new.ods.keys():
+		object_diff = _diff_ods_data(id, old.ods[id], new.ods[id], compare_pixels)
+		if object_diff is not None:
+			diff.objects.append(object_diff)
+	return diff
+
+def _compare(fields: list[PGSFieldDiff], segment: str, id: int | None, field: str, old, new):
+	if old != new:
+		fields.append(PGSFieldDiff(segment, id, field, old, new))
+
+def _pcs_object_fields(obj: PCSObject) -> tuple:
+	crop = (obj.crop.x, obj.crop.y, obj.crop.width, obj.crop.height) if obj.crop is not None else None
+	return (obj.object_id, obj.window_id, obj.x, obj.y, crop)
+
+def _diff_pcs(fields: list[PGSFieldDiff], old: PCSSegment, new: PCSSegment):
+	for field in ('width', 'height', 'framerate', 'number', 'state', 'is_palette_only_update', 'palette_id'):
+		_compare(fields, 'pcs', None, field, getattr(old, field), getattr(new, field))
+	_compare(fields, 'pcs', None, 'objects', [_pcs_object_fields(obj) for obj in old.objects], [_pcs_object_fields(obj) for obj in new.objects])
+
+def _diff_wds(fields: list[PGSFieldDiff], old: WDSSegment, new: WDSSegment):
+	old_windows = {window.id: (window.x, window.y, window.width, window.height) for window in old.windows}
+	new_windows = {window.id: (window.x, window.y, window.width, window.height) for window in new.windows}
+	for id in sorted(old_windows.keys() | new_windows.keys()):
+		_compare(fields, 'wds', id, 'window', old_windows.get(id), new_windows.get(id))
+
+def _diff_segments(fields: list[PGSFieldDiff], segment: str, old: dict, new: dict, diff_segment: typing.Callable):
+	"""Reports the segments that only one side has, then compares the ones they share with diff_segment."""
+	for id in sorted(old.keys() | new.keys()):
+		if id not in new:
+			fields.append(PGSFieldDiff(segment, id, 'segment', old[id], None))
+		elif id not in old:
+			fields.append(PGSFieldDiff(segment, id, 'segment', None, new[id]))
+		else:
+			diff_segment(fields, id, old[id], new[id])
+
+def _diff_pds(fields: list[PGSFieldDiff], id: int, old: PDSSegment, new: PDSSegment):
+	_compare(fields, 'pds', id, 'version', old.version, new.version)
+	old_palette = old.palette_array
+	new_palette = new.palette_array
+	if old_palette.shape != new_palette.shape or not np.array_equal(old_palette, new_palette):
+		# only report the palette entries that changed, as id: [Y, CR, CB, ALPHA]
+		old_entries = {int(row[0]): row[1:].tolist() for row in old_palette}
+		new_entries = {int(row[0]): row[1:].tolist() for row in new_palette}
+		changed = sorted(i for i in old_entries.keys() | new_entries.keys() if old_entries.get(i) != new_entries.get(i))
+		fields.append(PGSFieldDiff('pds', id, 'palettes',
+			{i: old_entries[i] for i in changed if i in old_entries},
+			{i: new_entries[i] for i in changed if i in new_entries}
+		))
+
+def _diff_ods_header(fields: list[PGSFieldDiff], id: int, old: ODSSegment, new: ODSSegment):
+	for field in ('version', 'width', 'height'):
+		_compare(fields, 'ods', id, field, getattr(old, field), getattr(new, field))
+
+def _rle_hash(ods: ODSSegment) -> bytes:
+	return hashlib.blake2b(ods.rle_data, digest_size=16).digest()
+
+def _diff_ods_data(id: int, old: ODSSegment, new: ODSSegment, compare_pixels: bool) -> PGSObjectDiff | None:
+	if len(old.rle_data) == len(new.rle_data) and _rle_hash(old) == _rle_hash(new):
+		return None
+	diff = PGSObjectDiff(id, old, new)
+	if not compare_pixels or (old.width, old.height) != (new.width, new.height):
+		return diff
+
+	changed = old.get_indexes() != new.get_indexes()
+	diff.changed_pixels = int(np.count_nonzero(changed))
+	if diff.changed_pixels:
+		rows = np.flatnonzero(changed.any(axis=1))
+		columns = np.flatnonzero(changed.any(axis=0))
+		diff.bounding_box = (int(columns[0]), int(rows[0]), int(columns[-1] - columns[0] + 1), int(rows[-1] - rows[0] + 1))
+	return diff
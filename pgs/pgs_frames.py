@@ -0,0 +1,51 @@
+from fractions import Fraction
+import typing
+import numpy as np
+import pgs
+from .pgs_parser import PGSDisplaySet
+from .pgs_compositor import PGSCompositor
+
+PTS_CLOCK = 90000
+"""PTS values are in 90kHz ticks."""
+
+def write_rgba_frames(display_sets: typing.Iterable[PGSDisplaySet], stream: typing.BinaryIO, framerate: Fraction = Fraction(24000, 1001), end_pts: int | None = None, cache: 'pgs.PGSImageCache | None' = None) -> int:
+	"""Renders the display sets and writes what is on screen as raw RGBA frames at framerate, starting at PTS 0.
+	The output can be read with `ffmpeg -f rawvideo -pix_fmt rgba -s {width}x{height} -r {framerate} -i -`.
+	Display sets are only rendered when a new one starts, frames in between write the same canvas again,
+	so only the current frame is held in memory and display_sets can be a lazy iterator like PGSParser.iter_display_sets.
+	Frames are written up to end_pts, or up to the frame showing the last display set when it isn't set.
+	Returns the amount of frames written."""
+	framerate = Fraction(framerate)
+	if framerate <= 0:
+		raise ValueError(f'invalid framerate {framerate}')
+	ticks_per_frame = PTS_CLOCK / framerate
+
+	compositor = PGSCompositor(cache)
+	frame: np.ndarray | None = None
+	frame_count = 0
+	for ds in display_sets:
+		pcs = ds.pcs
+		if frame is None:
+			# nothing is shown before the first display set
+			frame = np.zeros((pcs.height, pcs.width, 4), dtype=np.uint8)
+		elif frame.shape[:2] != (pcs.height, pcs.width):
+			raise pgs.PGSParserException(f'display set {ds.id} changes the video size from {frame.shape[1]}x{frame.shape[0]} to {pcs.width}x{pcs.height}')
+
+		while frame_count * ticks_per_frame < pcs.pts and (end_pts is None or frame_count * ticks_per_frame < end_pts):
+			stream.write(frame.data)
+			frame_count += 1
+		if end_pts is not None and pcs.pts >= end_pts:
+			break
+		frame = compositor.render(ds)
+
+	if frame is None:
+		return frame_count
+
+	if end_pts is None:
+		stream.write(frame.data)
+		return frame_count + 1
+
+	while frame_count * ticks_per_frame < end_pts:
+		stream.write(frame.data)
+		frame_count += 1
+	return frame_count
@@ -1,16 +1,119 @@
+from PIL import Image
+from enum import Enum
+from functools import lru_cache
 import numpy as np
 import pgs
 
-def segment_to_pil(pds) -> np.array:
+class PGSColorMatrix(Enum):
+	"""YCbCr <-> RGB conversion matrices. DVDs and older streams use BT.601, HD Blu-ray streams use BT.709."""
+	BT601 = 'bt601'
+	BT709 = 'bt709'
+
+# R = Y + CR_R * Cr | G = Y - CB_G * Cb - CR_G * Cr | B = Y + CB_B * Cb
+YCBCR_TO_RGB_COEFFICIENTS: dict[PGSColorMatrix, tuple[float, float, float, float]] = {
+	PGSColorMatrix.BT601: (1.402, 0.344136, 0.714136, 1.772),
+	PGSColorMatrix.BT709: (1.5748, 0.187324, 0.468124, 1.8556),
+}
+"""CR_R - CB_G - CR_G - CB_B"""
+
+RGB_TO_YCBCR_COEFFICIENTS: dict[PGSColorMatrix, tuple[tuple[float, float, float], tuple[float, float, float], tuple[float, float, float]]] = {
+	PGSColorMatrix.BT601: ((0.299, 0.587, 0.11400), (-0.16874, -0.33126, 0.5), (0.5, -0.41869, -0.08131)),
+	PGSColorMatrix.BT709: ((0.2126, 0.7152, 0.0722), (-0.114572, -0.385428, 0.5), (0.5, -0.454153, -0.045847)),
+}
+"""Y - CB - CR rows of R - G - B factors"""
+
+LUT_PRECISION = 16
+"""Amount of fractional bits used by the integer lookup tables."""
+
+def segment_to_pil(pds, matrix: PGSColorMatrix = PGSColorMatrix.BT601, full_range: bool = True, use_lut: bool = False) -> np.array:
 	# pre-populate from 0 to 255
-	pil_palette = np.array([(0,0,0,0)] * 256, dtype=np.uint8)
+	pil_palette = np.zeros((256, 4), dtype=np.uint8)
 	# set values at the right indexs in case they are mixed up or something
-	for p in pds.palettes:
-		pil_palette[p.id] = np.array((*ycbcr_to_rgb(p.lum,  p.cb, p.cr), p.alpha), dtype=np.uint8)
+	palettes = pds.palette_array
+	# PDS entries are stored as Y - CR - CB
+	pil_palette[palettes[:,0], :3] = ycbcr_to_rgb_array(palettes[:,[1,3,2]], matrix, full_range, use_lut)
+	pil_palette[palettes[:,0], 3] = palettes[:,4]
 	return pil_palette
 
+def indexes_to_image(indexes: np.ndarray, palette) -> Image.Image:
+	"""Makes a 'P' image out of a (height, width) array of palette indexes and an RGBA palette."""
+	(height, width) = indexes.shape
+	img = Image.frombuffer('P', (width, height), np.ascontiguousarray(indexes, dtype=np.uint8), 'raw', 'P', 0, 1)
+	img.putpalette(palette, rawmode='RGBA')
+	return img
+
 def pil_color_to_pds_palette(rgba, id) -> 'pgs.PDSPalette':
-	return pgs.PDSPalette(id, *rgb_to_ycbcr(*rgba[0:3]), rgba[3])
+	(y, cb, cr) = rgb_to_ycbcr(*rgba[0:3])
+	return pgs.PDSPalette(id, y, cr, cb, rgba[3])
+
+def rgba_to_pds_palette_array(rgba: np.ndarray, ids: np.ndarray | None = None, matrix: PGSColorMatrix = PGSColorMatrix.BT601, full_range: bool = True, use_lut: bool = False) -> np.ndarray:
+	"""Converts an (n, 4) RGBA palette to the (n, 5) ID - Y - CR - CB - ALPHA layout used by PDSSegment.palette_array.
+	The ids default to the position of the color in the palette."""
+	rgba = np.asarray(rgba, dtype=np.uint8).reshape(-1, 4)
+	ycbcra = rgb_to_ycbcr_array(rgba, matrix, full_range, use_lut)
+	palette_array = np.empty((len(rgba), 5), dtype=np.uint8)
+	palette_array[:,0] = np.arange(len(rgba)) if ids is None else ids
+	palette_array[:,1:4] = ycbcra[:,[0,2,1]]
+	palette_array[:,4] = ycbcra[:,3]
+	return palette_array
+
+PDS_MAX_PALETTE_ENTRIES = 256
+
+def quantize_rgba(images: list[np.ndarray], max_colors: int = PDS_MAX_PALETTE_ENTRIES, reduce: bool = False) -> tuple[list[np.ndarray], list['pgs.PDSPalette']]:
+	"""Builds a single palette for (height, width, 4) RGBA images that are shown together, like the objects of a display set.
+	Returns the (height, width) palette index array of every image and the PDS palette entries, index 0 always being full transparency.
+	Every pixel with an alpha of 0 becomes that transparent entry.
+	When there are more than max_colors colors, reduce maps the least used ones to the closest kept color, otherwise a PGSParserException is raised."""
+	if not 1 < max_colors <= PDS_MAX_PALETTE_ENTRIES:
+		raise ValueError(f'max_colors has to be between 2 and {PDS_MAX_PALETTE_ENTRIES}')
+
+	# each RGBA pixel packed in a single uint32 so the colors can be found with a 1D unique
+	packed = []
+	for image in images:
+		image = np.ascontiguousarray(image, dtype=np.uint8)
+		if image.ndim != 3 or image.shape[2] != 4:
+			raise ValueError(f'expected a (height, width, 4) array but got one with shape {image.shape}')
+		pixels = image.view(np.uint32).reshape(-1)
+		packed.append(np.where(image[:,:,3].reshape(-1) == 0, np.uint32(0), pixels))
+	# starts with a transparent pixel so it's always in the palette, and first since it's the smallest value
+	packed.insert(0, np.zeros(1, dtype=np.uint32))
+	(colors, inverse, counts) = np.unique(np.concatenate(packed), return_inverse=True, return_counts=True)
+
+	if len(colors) > max_colors:
+		if not reduce:
+			raise pgs.PGSParserException(f'the images have {len(colors)} colors but the palette is limited to {max_colors}')
+		(colors, mapping) = _reduce_colors(colors, counts, max_colors)
+		inverse = mapping[inverse]
+
+	# split the indexes back per image, skipping the transparent pixel that was added
+	indexes = []
+	offset = 1
+	for image in images:
+		(height, width) = image.shape[:2]
+		indexes.append(inverse[offset:offset + height * width].astype(np.uint8).reshape(height, width))
+		offset += height * width
+
+	rgba = colors.view(np.uint8).reshape(-1, 4)
+	palettes = [pil_color_to_pds_palette(color, i) for i, color in enumerate(rgba.tolist())]
+	return (indexes, palettes)
+
+def _reduce_colors(colors: np.ndarray, counts: np.ndarray, max_colors: int) -> tuple[np.ndarray, np.ndarray]:
+	"""Keeps transparency and the most used colors, the others go to the closest kept one. Returns the kept colors and the old index -> new index mapping."""
+	# transparency is at 0 and has to stay there
+	by_use = np.argsort(-counts[1:], kind='stable') + 1
+	kept = np.sort(np.concatenate(([0], by_use[:max_colors - 1])))
+	dropped = by_use[max_colors - 1:]
+
+	mapping = np.empty(len(colors), dtype=np.intp)
+	mapping[kept] = np.arange(len(kept))
+	kept_rgba = colors[kept].view(np.uint8).reshape(-1, 4).astype(np.int32)
+	dropped_rgba = colors[dropped].view(np.uint8).reshape(-1, 4).astype(np.int32)
+	# chunked so the distance matrix stays small
+	for start in range(0, len(dropped), 4096):
+		chunk = dropped_rgba[start:start + 4096]
+		distances = ((chunk[:, None, :] - kept_rgba[None, :, :]) ** 2).sum(axis=2)
+		mapping[dropped[start:start + 4096]] = distances.argmin(axis=1)
+	return (colors[kept], mapping)
 
 def ycbcr_to_rgb(y,cb,cr):
 	r = y                         + 1.402    * (cr - 128)
@@ -28,4 +131,83 @@ def rgb_to_ycbcr(r,g,b) -> tuple[int,int,int]:
 	y = int(max(0, min(0xff, y)))
 	cb = int(max(0, min(0xff, cb)))
 	cr = int(max(0, min(0xff, cr)))
-	return (y, cb, cr)
\ No newline at end of file
+	return (y, cb, cr)
+
+def ycbcr_to_rgb_array(ycbcr: np.ndarray, matrix: PGSColorMatrix = PGSColorMatrix.BT601, full_range: bool = True, use_lut: bool = False) -> np.ndarray:
+	"""Array version of ycbcr_to_rgb. Takes a (..., 3) Y - CB - CR array, or (..., 4) with an alpha channel that is kept as is.
+	Limited range input uses 16-235 for Y and 16-240 for CB and CR.
+	The lookup tables use fixed point integers which can be 1 off of the float conversion."""
+	ycbcr = np.asarray(ycbcr)
+	converted = np.empty(ycbcr.shape, dtype=np.uint8)
+	if use_lut:
+		(y_lut, cr_r_lut, cb_g_lut, cr_g_lut, cb_b_lut) = _ycbcr_to_rgb_luts(matrix, full_range)
+		(y, cb, cr) = (ycbcr[...,0].astype(np.intp), ycbcr[...,1].astype(np.intp), ycbcr[...,2].astype(np.intp))
+		y = y_lut[y]
+		rgb = (y + cr_r_lut[cr], y - cb_g_lut[cb] - cr_g_lut[cr], y + cb_b_lut[cb])
+		for i, channel in enumerate(rgb):
+			converted[...,i] = np.clip(channel >> LUT_PRECISION, 0, 0xff)
+	else:
+		(y, cb, cr) = _normalize_ycbcr(ycbcr[...,0].astype(np.float64), ycbcr[...,1].astype(np.float64), ycbcr[...,2].astype(np.float64), full_range)
+		(cr_r, cb_g, cr_g, cb_b) = YCBCR_TO_RGB_COEFFICIENTS[matrix]
+		rgb = (y + cr_r * cr, y - cb_g * cb - cr_g * cr, y + cb_b * cb)
+		for i, channel in enumerate(rgb):
+			converted[...,i] = np.clip(channel, 0, 0xff)
+	if ycbcr.shape[-1] == 4:
+		converted[...,3] = ycbcr[...,3]
+	return converted
+
+def rgb_to_ycbcr_array(rgb: np.ndarray, matrix: PGSColorMatrix = PGSColorMatrix.BT601, full_range: bool = True, use_lut: bool = False) -> np.ndarray:
+	"""Array version of rgb_to_ycbcr. Takes a (..., 3) R - G - B array, or (..., 4) with an alpha channel that is kept as is.
+	Returns Y - CB - CR(- A) values. The lookup tables use fixed point integers which can be 1 off of the float conversion."""
+	rgb = np.asarray(rgb)
+	converted = np.empty(rgb.shape, dtype=np.uint8)
+	if use_lut:
+		luts = _rgb_to_ycbcr_luts(matrix, full_range)
+		(r, g, b) = (rgb[...,0].astype(np.intp), rgb[...,1].astype(np.intp), rgb[...,2].astype(np.intp))
+		for i, (r_lut, g_lut, b_lut) in enumerate(luts):
+			converted[...,i] = np.clip((r_lut[r] + g_lut[g] + b_lut[b]) >> LUT_PRECISION, 0, 0xff)
+	else:
+		(r, g, b) = (rgb[...,0].astype(np.float64), rgb[...,1].astype(np.float64), rgb[...,2].astype(np.float64))
+		((y_r, y_g, y_b), (cb_r, cb_g, cb_b), (cr_r, cr_g, cr_b)) = RGB_TO_YCBCR_COEFFICIENTS[matrix]
+		y  = r * y_r  + g * y_g  + b * y_b
+		cb = r * cb_r + g * cb_g + b * cb_b
+		cr = r * cr_r + g * cr_g + b * cr_b
+		for i, channel in enumerate(_denormalize_ycbcr(y, cb, cr, full_range)):
+			converted[...,i] = np.clip(channel, 0, 0xff)
+	if rgb.shape[-1] == 4:
+		converted[...,3] = rgb[...,3]
+	return converted
+
+def _normalize_ycbcr(y, cb, cr, full_range: bool):
+	"""Maps YCbCr values to full range Y with CB and CR centered on 0."""
+	if full_range:
+		return (y, cb - 128, cr - 128)
+	return ((y - 16) * (255 / 219), (cb - 128) * (255 / 224), (cr - 128) * (255 / 224))
+
+def _denormalize_ycbcr(y, cb, cr, full_range: bool):
+	"""Inverse of _normalize_ycbcr."""
+	if full_range:
+		return (y, cb + 128, cr + 128)
+	return (y * (219 / 255) + 16, cb * (224 / 255) + 128, cr * (224 / 255) + 128)
+
+@lru_cache
+def _ycbcr_to_rgb_luts(matrix: PGSColorMatrix, full_range: bool) -> tuple[np.ndarray, ...]:
+	values = np.arange(256, dtype=np.float64)
+	(y, cb, cr) = _normalize_ycbcr(values, values, values, full_range)
+	(cr_r, cb_g, cr_g, cb_b) = YCBCR_TO_RGB_COEFFICIENTS[matrix]
+	scale = 1 << LUT_PRECISION
+	return tuple(np.round(lut * scale).astype(np.int64) for lut in (y, cr_r * cr, cb_g * cb, cr_g * cr, cb_b * cb))
+
+@lru_cache
+def _rgb_to_ycbcr_luts(matrix: PGSColorMatrix, full_range: bool) -> tuple[tuple[np.ndarray, np.ndarray, np.ndarray], ...]:
+	values = np.arange(256, dtype=np.float64)
+	scale = 1 << LUT_PRECISION
+	# the offsets are folded in the R table so a lookup is just 3 additions
+	zeros = np.zeros(256)
+	offsets = _denormalize_ycbcr(zeros, zeros, zeros, full_range)
+	range_factors = (1.0, 1.0, 1.0) if full_range else (219 / 255, 224 / 255, 224 / 255)
+	luts = []
+	for (r, g, b), offset, range_factor in zip(RGB_TO_YCBCR_COEFFICIENTS[matrix], offsets, range_factors):
+		channel_luts = (values * r * range_factor + offset, values * g * range_factor, values * b * range_factor)
+		luts.append(tuple(np.round(lut * scale).astype(np.int64) for lut in channel_luts))
+	return tuple(luts)
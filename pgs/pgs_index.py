@@ -0,0 +1,144 @@
+import io
+import os
+import mmap
+import typing
+import numpy as np
+import pgs
+from .pgs_parser import PGS_MAGIC_VALUE, PGS_HEADER_LAYOUT, PCS_HEADER_LAYOUT, PCS_HEADER_LENGTH, PCSSegment, ENDSegment, PCSState, PGSContext, PGSDisplaySet, PGSParser
+
+PGS_INDEX_DTYPE = np.dtype([
+	('start', '<u8'),
+	('end', '<u8'),
+	('pts', '<u4'),
+	('state', 'u1'),
+	('epoch_start', '<u8'),
+	('decode_start', '<u8'),
+])
+"""START - END - PTS - PCS_STATE - EPOCH_START - DECODE_START
+start/end: byte range of the display set
+epoch_start: start of the display set that started the epoch this display set is part of
+decode_start: start of the closest display set at or before this one that isn't a NORMAL update, decoding can start from there"""
+
+class PGSIndex:
+	"""Byte offset index of the display sets in a PGS stream, built by only reading the segment headers."""
+	entries: np.ndarray
+	"""Structured array with one PGS_INDEX_DTYPE entry per display set."""
+
+	def __init__(self, entries: np.ndarray):
+		if entries.dtype != PGS_INDEX_DTYPE:
+			raise pgs.PGSParserException(f'unexpected index layout: {entries.dtype}')
+		self.entries = entries
+
+	def __len__(self) -> int:
+		return len(self.entries)
+
+	@staticmethod
+	def build(source) -> 'PGSIndex':
+		"""Indexes a path, bytes like object or binary stream.
+		Payloads are skipped, only the composition state of PCS segments is read."""
+		if isinstance(source, (str, os.PathLike)):
+			with pgs.map_file(source) as mapped:
+				return PGSIndex.build(mapped)
+
+		if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+			reader = pgs.PGSBufferIO(source)
+		else:
+			reader = pgs.PGSStreamIO(source)
+
+		entries = []
+		ds_start = None
+		ds_pts = 0
+		ds_state = PCSState.NORMAL
+		epoch_start = 0
+		decode_start = 0
+		with reader:
+			while reader.can_read():
+				segment_start = reader.tell()
+				(magic, pts, _, segment_type, size) = reader.unpack(PGS_HEADER_LAYOUT)
+				if magic != PGS_MAGIC_VALUE:
+					raise pgs.PGSParserException(f'invalid packet header @ 0x{segment_start:x}')
+
+				if segment_type == PCSSegment.get_segment_id():
+					if size < PCS_HEADER_LENGTH:
+						raise pgs.PGSParserException(f'PCS segment @ 0x{segment_start:x} is too short ({size})')
+					# only the state is needed out of the payload
+					state_flag = reader.unpack(PCS_HEADER_LAYOUT)[4]
+					try:
+						ds_state = PCSState(state_flag)
+					except ValueError:
+						raise pgs.PGSParserException(f'unknown composition flag 0x{state_flag:02x} @ 0x{segment_start:x}')
+					size -= PCS_HEADER_LENGTH
+					ds_start = segment_start
+					ds_pts = pts
+					# same rules as PGSContext.update
+					if PCSState.EPOCH_START in ds_state:
+						epoch_start = ds_start
+					if ds_state != PCSState.NORMAL:
+						decode_start = ds_start
+				
+				if size > 0:
+					reader.seek(size, io.SEEK_CUR)
+
+				if segment_type == ENDSegment.get_segment_id():
+					if ds_start is None:
+						raise pgs.PGSParserException(f'END segment @ 0x{segment_start:x} is not part of a display set')
+					entries.append((ds_start, reader.tell(), ds_pts, int(ds_state), epoch_start, decode_start))
+					ds_start = None
+
+		return PGSIndex(np.array(entries, dtype=PGS_INDEX_DTYPE))
+
+	def save(self, file_path):
+		"""Saves the index as a .npy sidecar file."""
+		with open(file_path, 'wb') as f:
+			np.save(f, self.entries, allow_pickle=False)
+
+	@staticmethod
+	def load(file_path, memory_map: bool = True) -> 'PGSIndex':
+		"""Loads a sidecar file made by save, memory mapped by default."""
+		return PGSIndex(np.load(file_path, mmap_mode='r' if memory_map else None, allow_pickle=False))
+
+	def find(self, pts: int) -> int:
+		"""Index of the display set that is active at pts, -1 if pts is before the first display set."""
+		return int(np.searchsorted(self.entries['pts'], pts, side='right')) - 1
+
+	def find_range(self, start_pts: int, end_pts: int) -> range:
+		"""Indexes of the display sets active between start_pts and end_pts (inclusive)."""
+		first = max(0, self.find(start_pts))
+		last = int(np.searchsorted(self.entries['pts'], end_pts, side='right'))
+		return range(first, max(first, last))
+
+	def get_decode_start(self, display_set_index: int) -> int:
+		"""Index of the display set decoding has to start from to get a valid context for the given display set."""
+		return int(np.searchsorted(self.entries['start'], self.entries['decode_start'][display_set_index]))
+
+	def read_range(self, source, start_pts: int, end_pts: int) -> list[PGSDisplaySet]:
+		"""Decodes only the display sets active between start_pts and end_pts, starting from the closest refresh point before them.
+		The source has to be the path or bytes like object the index was made from."""
+		wanted = self.find_range(start_pts, end_pts)
+		return [ds for ds in self.iter_display_sets(source, wanted) if ds.id in wanted]
+
+	def iter_display_sets(self, source, wanted: range) -> typing.Iterator[PGSDisplaySet]:
+		"""Decodes the display sets with the wanted indexes along with the ones before them needed to get a valid context,
+		starting from the closest refresh point before them."""
+		if len(wanted) == 0:
+			return
+		if isinstance(source, (str, os.PathLike)):
+			with pgs.map_file(source) as mapped:
+				yield from self.iter_display_sets(mapped, wanted)
+			return
+
+		first = self.get_decode_start(wanted.start)
+		end = int(self.entries['end'][wanted.stop - 1])
+		with pgs.PGSBufferIO(source) as reader:
+			reader.seek(int(self.entries['start'][first]))
+			display_set_id = first
+			curr_display_set = []
+			for segment in PGSParser.iter_segments(reader, PGSContext(), end):
+				curr_display_set.append(segment)
+				if isinstance(segment, ENDSegment):
+					display_set = PGSDisplaySet(curr_display_set, display_set_id)
+					for ods in display_set.ods.values():
+						ods.join_fragments()
+					yield display_set
+					display_set_id += 1
+					curr_display_set = []
@@ -1,8 +1,14 @@
 import pgs
 from io import BytesIO
 import io
+import os
+import mmap
 import struct
+import sys
+import traceback
 import typing
+import warnings
+from contextlib import contextmanager
 
 class PGSIO:
 	__readonly: bool
@@ -112,3 +118,242 @@ class PGSIO:
 
 
 	
+class PGSBufferIO(PGSIO):
+	"""Read only PGSIO that reads from a memoryview of the data instead of copying it to a BytesIO.
+	Reads return memoryview slices of the original buffer, so copy them if you need them to outlive it."""
+	__view: memoryview | None
+	__length: int
+	__pos: int
+	__source: typing.Any
+	__searchable: bytes | bytearray | mmap.mmap | None
+
+	def __init__(self, initial_bytes):
+		self.__view = memoryview(initial_bytes).cast('B')
+		self.__length = len(self.__view)
+		self.__pos = 0
+		self.__source = initial_bytes
+		self.__searchable = None
+
+	def __enter__(self) -> 'PGSBufferIO':
+		if self.__view is None:
+			raise BufferError('buffer was already closed')
+		return self
+
+	def __exit__(self, exec_type, exec_value, traceback):
+		self.close()
+
+	def __len__(self) -> int:
+		return self.__length
+
+	def tell(self) -> int:
+		return self.__pos
+
+	def seek(self, offset, whence: int = io.SEEK_SET) -> int:
+		if whence == io.SEEK_CUR:
+			offset += self.__pos
+		elif whence == io.SEEK_END:
+			offset += self.__length
+		elif whence != io.SEEK_SET:
+			raise ValueError(f'invalid whence ({whence})')
+		if offset < 0:
+			raise ValueError(f'negative seek value {offset}')
+		self.__pos = offset
+		return self.__pos
+
+	def close(self):
+		if self.__view is not None:
+			self.__view.release()
+			self.__view = None
+			self.__source = None
+			self.__searchable = None
+
+	def find(self, sub: bytes, start: int | None = None) -> int:
+		"""Offset of the first occurrence of sub at or after start (the current position by default), -1 when there is none.
+		The position isn't moved."""
+		if self.__view is None:
+			raise pgs.PGSIOException('buffer was already closed')
+		if self.__searchable is None:
+			# memoryviews and other buffers have no find, they get copied once
+			if isinstance(self.__source, (bytes, bytearray, mmap.mmap)):
+				self.__searchable = self.__source
+			else:
+				self.__searchable = self.__view.tobytes()
+		return self.__searchable.find(sub, self.__pos if start is None else start)
+
+	def unpack(self, fmt:str) -> tuple[typing.Any, ...]:
+		fmt = '>' + fmt
+		# calculate the expected size and make sure we can read it
+		size = struct.calcsize(fmt)
+		if size == 0:
+			raise pgs.PGSIOException('We should never be doing a 0 len read.')
+		if not self.can_read(size):
+			raise pgs.PGSIOException('Tried to read past end of buffer.')
+
+		# parse the data in place
+		data = struct.unpack_from(fmt, self.__view, self.__pos)
+		self.__pos += size
+		return data
+
+	def read(self, size: int | None = None) -> memoryview:
+		# default arg to the rest of the buffer
+		size = self.__length - self.__pos if not isinstance(size, int) or size < 0 else size
+
+		# since we always know what we are reading we should never do a 0 len read
+		if size == 0:
+			raise pgs.PGSIOException('We should never be doing a 0 len read.')
+
+		# if we are reading while at the end of the buffer something went wrong
+		if not self.can_read(size):
+			raise pgs.PGSIOException('Tried to read past end of buffer.')
+
+		data = self.__view[self.__pos:self.__pos + size]
+		self.__pos += size
+		return data
+
+	def can_read(self, size: int | None = None) -> bool:
+		# default arg to 1 and set a min value of 1 since 0 len reads should never happen
+		size = 1 if (not isinstance(size, int)) or size < 1 else size
+		return (self.__pos + size) <= self.__length
+
+	def write(self, buffer: bytes) -> int:
+		raise pgs.PGSIOException('buffer is non writable.')
+
+class PGSStreamIO(PGSIO):
+	"""PGSIO that reads from or writes to a binary stream (file, pipe, socket...) as the data is needed.
+	The stream can't be seeked backwards and is not closed with the PGSStreamIO."""
+	__stream: typing.BinaryIO | None
+	__lookahead: bytes
+	__pos: int
+
+	def __init__(self, stream: typing.BinaryIO):
+		self.__stream = stream
+		self.__lookahead = b''
+		self.__pos = 0
+
+	def __enter__(self) -> 'PGSStreamIO':
+		if self.__stream is None:
+			raise BufferError('stream was already closed')
+		return self
+
+	def __exit__(self, exec_type, exec_value, traceback):
+		self.close()
+
+	def __len__(self) -> int:
+		raise pgs.PGSIOException('the length of a stream is unknown.')
+
+	def tell(self) -> int:
+		return self.__pos
+
+	def seek(self, offset, whence: int = io.SEEK_SET) -> int:
+		if whence == io.SEEK_SET:
+			offset -= self.__pos
+		elif whence != io.SEEK_CUR:
+			raise pgs.PGSIOException('streams can only be seeked from the current position.')
+		if offset < 0:
+			raise pgs.PGSIOException('streams can not be seeked backwards.')
+
+		# skip by reading, this works on pipes
+		while offset > 0:
+			skipped = len(self.__fill(min(offset, io.DEFAULT_BUFFER_SIZE)))
+			if skipped == 0:
+				break
+			self.__lookahead = self.__lookahead[skipped:]
+			self.__pos += skipped
+			offset -= skipped
+		return self.__pos
+
+	def close(self):
+		if self.__stream is not None:
+			if hasattr(self.__stream, 'writable') and self.__stream.writable():
+				self.__stream.flush()
+			self.__stream = None
+
+	def __fill(self, size: int) -> bytes:
+		# pipes can return less than requested, keep reading until we have enough or the stream ends
+		if len(self.__lookahead) < size:
+			chunks = [self.__lookahead]
+			available = len(self.__lookahead)
+			while available < size:
+				data = self.__stream.read(size - available)
+				if not data:
+					break
+				chunks.append(data)
+				available += len(data)
+			self.__lookahead = b''.join(chunks)
+		return self.__lookahead[:size]
+
+	def unpack(self, fmt:str) -> tuple[typing.Any, ...]:
+		fmt = '>' + fmt
+		# calculate the expected size and read the data
+		size = struct.calcsize(fmt)
+		buf = self.read(size)
+
+		# return parsed data
+		return struct.unpack(fmt, buf)
+
+	def read(self, size: int | None = None) -> bytes:
+		# default arg to the rest of the stream
+		if not isinstance(size, int) or size < 0:
+			data = self.__lookahead + self.__stream.read()
+			self.__lookahead = b''
+		else:
+			# since we always know what we are reading we should never do a 0 len read
+			if size == 0:
+				raise pgs.PGSIOException('We should never be doing a 0 len read.')
+
+			data = self.__fill(size)
+			self.__lookahead = self.__lookahead[size:]
+
+			# we should always know the length of the data we are reading
+			if len(data) != size:
+				raise pgs.PGSIOException('Tried to read past end of stream.')
+
+		# we should never do a 0 len read so if we get nothing assume we reached an expected EOF
+		if len(data) == 0:
+			raise pgs.PGSIOException('Unnexpected EOF')
+
+		self.__pos += len(data)
+		return data
+
+	def can_read(self, size: int | None = None) -> bool:
+		# default arg to 1 and set a min value of 1 since 0 len reads should never happen
+		size = 1 if (not isinstance(size, int)) or size < 1 else size
+		return len(self.__fill(size)) >= size
+
+	def write(self, buffer: bytes) -> int:
+		# check args
+		if not isinstance(buffer, bytes):
+			raise pgs.PGSIOException('attempted to write something other than bytes.')
+
+		written = self.__stream.write(buffer)
+		# raw streams may not write everything at once
+		while written is not None and written < len(buffer):
+			written += self.__stream.write(buffer[written:])
+		self.__pos += len(buffer)
+		return len(buffer)
+
+
+@contextmanager
+def map_file(file_path) -> typing.Iterator[mmap.mmap | bytes]:
+	"""Memory maps a file for reading, the mapping is closed when leaving the context.
+	Every view of the mapping has to be released by then, a view still held raises a PGSIOException."""
+	with open(file_path, 'rb') as f:
+		# empty files can't be mapped
+		if os.fstat(f.fileno()).st_size == 0:
+			yield b''
+			return
+		mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			yield mapped
+		finally:
+			error = sys.exc_info()[1]
+			if error is not None:
+				# a failed parse leaves views of the mapping (like unfinished ODS fragments) in the frames of its traceback
+				traceback.clear_frames(error.__traceback__)
+			try:
+				mapped.close()
+			except BufferError as e:
+				if error is None:
+					raise pgs.PGSIOException(f'{file_path} still has views of its mapping, copy the data that has to outlive map_file') from e
+				# don't hide the original error, the mapping stays open until the views are collected
+				warnings.warn(f'{file_path} could not be unmapped after a {type(error).__name__}', ResourceWarning)
@@ -0,0 +1,108 @@
+import hashlib
+import typing
+import numpy as np
+import pgs
+
+if typing.TYPE_CHECKING:
+	from .pgs_parser import ODSSegment, PGSDisplaySet
+
+def _digest(data) -> bytes:
+	return hashlib.blake2b(data, digest_size=16).digest()
+
+class PGSObjectStore:
+	"""Deduplicates ODS bitmaps by content.
+
+	Objects are keyed by (width, height, hash of rle_data). Interning an object replaces its rle_data with the buffer of the first
+	object that had the same content, so equal bitmaps share a single buffer for the rest of their life.
+	Since PGSImageCache and PGSFile.save_images key bitmaps on the identity of that buffer, each unique bitmap then only gets decoded and saved once.
+	Pass a store to the PGSParser read functions to intern objects as soon as their last fragment is read."""
+
+	objects: int
+	"""The amount of objects interned."""
+	total_bytes: int
+	"""The amount of rle data interned."""
+	encoded: int
+	"""The amount of bitmaps given to encode."""
+	encoded_unique: int
+	"""The amount of bitmaps encode actually had to encode."""
+
+	__buffers: dict[tuple[int, int, bytes], bytes]
+	__unique_bytes: int
+	__encodings: dict[tuple[tuple[int, ...], bytes], bytes]
+
+	def __init__(self):
+		self.objects = 0
+		self.total_bytes = 0
+		self.encoded = 0
+		self.encoded_unique = 0
+		self.__buffers = {}
+		self.__unique_bytes = 0
+		self.__encodings = {}
+
+	def __len__(self) -> int:
+		"""The amount of unique bitmaps."""
+		return len(self.__buffers)
+
+	@property
+	def unique_bytes(self) -> int:
+		"""The amount of rle data actually kept."""
+		return self.__unique_bytes
+
+	@property
+	def dedup_ratio(self) -> float:
+		"""Interned objects per unique bitmap, 1.0 means nothing was deduplicated."""
+		return self.objects / len(self.__buffers) if self.__buffers else 1.0
+
+	def clear(self):
+		"""Forgets every bitmap and resets the counters."""
+		self.objects = 0
+		self.total_bytes = 0
+		self.encoded = 0
+		self.encoded_unique = 0
+		self.__buffers.clear()
+		self.__encodings.clear()
+		self.__unique_bytes = 0
+
+	def intern(self, ods: 'ODSSegment') -> 'ODSSegment':
+		"""Makes the rle_data of a complete object the shared buffer of its content and returns the object."""
+		ods.join_fragments()
+		rle_data = ods.rle_data
+		key = (ods.width, ods.height, _digest(rle_data))
+		buffer = self.__buffers.get(key)
+		# a hash collision just means the object isn't deduplicated
+		if buffer is None:
+			buffer = bytes(rle_data)
+			self.__buffers[key] = buffer
+			self.__unique_bytes += len(buffer)
+		elif buffer is not rle_data and buffer != rle_data:
+			buffer = bytes(rle_data)
+		ods.rle_data = buffer
+		self.objects += 1
+		self.total_bytes += len(buffer)
+		return ods
+
+	def intern_all(self, display_sets: typing.Iterable['PGSDisplaySet']):
+		"""Interns every object of already parsed display sets."""
+		for ds in display_sets:
+			for ods in ds.ods.values():
+				self.intern(ods)
+
+	def encode(self, indexes: np.ndarray) -> bytes:
+		"""encode_pgs_rle_array that only encodes each unique bitmap once.
+		The rle data returned for equal bitmaps is the same buffer, so it's deduplicated like interned objects are."""
+		indexes = np.ascontiguousarray(indexes, dtype=np.uint8)
+		key = (indexes.shape, _digest(indexes))
+		self.encoded += 1
+		encoded = self.__encodings.get(key)
+		if encoded is None:
+			self.encoded_unique += 1
+			encoded = pgs.encode_pgs_rle_array(indexes)
+			(height, width) = indexes.shape
+			buffer_key = (width, height, _digest(encoded))
+			if buffer_key in self.__buffers:
+				encoded = self.__buffers[buffer_key]
+			else:
+				self.__buffers[buffer_key] = encoded
+				self.__unique_bytes += len(encoded)
+			self.__encodings[key] = encoded
+		return encoded
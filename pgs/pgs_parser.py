@@ -3,8 +3,16 @@ import numpy as np
 import pgs
 import logging
 from os import path
+import os
+import shutil
+import mmap
 from enum import IntFlag
 import math
+import typing
+from io import BytesIO
+from collections import deque
+import multiprocessing
+import multiprocessing.pool
 
 # PGS format information:
 # Scorpius's blog
@@ -25,24 +33,33 @@ MAX_PGS_SEGMENT_LENGTH = 0xffff
 
 PCS_HEADER_LAYOUT = 'HHBHBBBB'
 """W - H - FPS - NUM - STATE - PALETTE-UPDATE-FLAGE - PALETTE_ID - PCS_OBJ_COUNT"""
+PCS_HEADER_LENGTH = pgs.PGSIO.calcsize(PCS_HEADER_LAYOUT)
 PCS_OBJECT_LAYOUT = 'HBBHH'
 """OBJ_ID - WINDOW_ID - CROP_FLAG - X - Y"""
+PCS_OBJECT_LENGTH = pgs.PGSIO.calcsize(PCS_OBJECT_LAYOUT)
 PCS_CROP_LAYOUT = 'HHHH'
 """X - Y - W - H"""
+PCS_CROP_LENGTH = pgs.PGSIO.calcsize(PCS_CROP_LAYOUT)
+PCS_PLAUSIBLE_LENGTHS = {PCS_HEADER_LENGTH + PCS_OBJECT_LENGTH * objects + PCS_CROP_LENGTH * crops for objects in range(3) for crops in range(objects + 1)}
+"""Every length a PCS segment can have with up to 2 objects, cropped or not."""
 
 
 
 WDS_HEADER_LAYOUT = 'B'
 """WDS_ID"""
+WDS_HEADER_LENGTH = pgs.PGSIO.calcsize(WDS_HEADER_LAYOUT)
 WDS_WINDOW_LAYOUT = 'BHHHH'
 """WINDOW_ID - X - Y - W - H"""
+WDS_WINDOW_LENGTH = pgs.PGSIO.calcsize(WDS_WINDOW_LAYOUT)
 
 
 
 PDS_HEADER_LAYOUT = 'BB'
 """PDS_ID - PDS_VER"""
+PDS_HEADER_LENGTH = pgs.PGSIO.calcsize(PDS_HEADER_LAYOUT)
 PDS_PALETTE_LAYOUT = 'BBBBB'
 """PALETTE_ID - Y - CR - CB - ALPHA"""
+PDS_PALETTE_LENGTH = pgs.PGSIO.calcsize(PDS_PALETTE_LAYOUT)
 
 
 
@@ -60,6 +77,7 @@ MAX_ODS_DATA_FRAGMENT_LEN = MAX_PGS_SEGMENT_LENGTH - pgs.PGSIO.calcsize(ODS_HEAD
 # END SEGMENT HAS NO DATA
 
 class PGSSegment:
+	__slots__ = ('pts', 'dts')
 	
 	pts: int
 	"""4 bytes: Presentation Timestamp"""
@@ -97,19 +115,23 @@ class PGSSegment:
 		
 	def serialize(self, writer: pgs.PGSIO):
 		self.write_segment_header(writer)
-		if isinstance(self, ENDSegment):
-			writer.pack('H', 0)
-		else:
-			with pgs.PGSIO() as segment_writer:
-				self.write(segment_writer)
-				writer.pack('H', segment_writer.tell())
-				segment_writer.seek(0)
-				writer.write(segment_writer.read())
+		# the length is known before hand so the segment can be written straight to the writer
+		size = self.get_segment_length()
+		if size > MAX_PGS_SEGMENT_LENGTH:
+			raise pgs.PGSParserException(f'tried to write a segment that is too long ({size}).')
+		writer.pack('H', size)
+		expected_end = writer.tell() + size
+		self.write(writer)
+		if writer.tell() != expected_end:
+			raise pgs.PGSParserException(f'wrote {writer.tell() - expected_end + size} bytes for a segment that should have been {size} bytes long.')
 
 	@staticmethod
 	def get_segment_id() -> int:
 		raise pgs.PGSParserException('failed to encode because of missing segment id')
 
+	def get_segment_length(self) -> int:
+		raise pgs.PGSParserException('failed to encode because of missing segment length')
+
 	
 	def write(self, _):
 		raise pgs.PGSParserException('segment has no write function')
@@ -127,12 +149,13 @@ class PGSSegment:
 # 11 - Epoch continue,    previous objects and palettes can be released
 # next 6 bits are reserved and therefore ignored
 class PCSState(IntFlag):
-    NORMAL =            0b00
-    ACQUISITION_POINT = 0b01
-    EPOCH_START =       0b10
-    EPOCH_CONTINUE =    0b11
+    NORMAL =            0b00_000000
+    ACQUISITION_POINT = 0b01_000000
+    EPOCH_START =       0b10_000000
+    EPOCH_CONTINUE =    0b11_000000
 
 class PCSObjectCrop:
+	__slots__ = ('x', 'y', 'width', 'height')
 
 	x:int
 	"""2 bytes: X offset from the top left pixel of the cropped object in the screen."""
@@ -157,6 +180,8 @@ class PCSObjectCrop:
 		writer.pack(PCS_CROP_LAYOUT, self.x, self.y, self.width, self.height)
 	
 class PCSObject:
+	__slots__ = ('object_id', 'window_id', 'x', 'y', 'crop')
+
 	object_id: int
 	"""2 bytes: ID of the ODS segment that defines the image to be shown"""
 	window_id: int
@@ -187,6 +212,9 @@ class PCSObject:
 		# return data
 		return PCSObject(window_id, object_id, x, y, crop)
 	
+	def get_length(self) -> int:
+		return PCS_OBJECT_LENGTH + (PCS_CROP_LENGTH if self.crop is not None else 0)
+
 	def write(self, writer: pgs.PGSIO):
 		crop_flag = self.crop is not None and 0x40 or 0x00
 		writer.pack(PCS_OBJECT_LAYOUT, self.object_id, self.window_id, crop_flag, self.x, self.y)
@@ -194,6 +222,7 @@ class PCSObject:
 			self.crop.write(writer)
 
 class PCSSegment(PGSSegment):
+	__slots__ = ('width', 'height', 'framerate', 'number', 'state', 'is_palette_only_update', 'palette_id', 'objects')
 	
 	width: int
 	"""2 bytes: Video width in pixels (ex. 0x780 = 1920)"""
@@ -239,7 +268,8 @@ class PCSSegment(PGSSegment):
 		except ValueError:
 			raise pgs.PGSParserException('unknown composition flag 0x{state_flag:02x}')
 
-		is_update = palette_update_flag == 0x40
+		# older versions of this library wrote 0x40
+		is_update = palette_update_flag in (0x40, 0x80)
 
 		# read objects
 		objects: list[PCSObject] = []
@@ -253,7 +283,7 @@ class PCSSegment(PGSSegment):
 		state_flag = int(self.state)
 		palette_update_flag = 0x00
 		if (self.is_palette_only_update):
-			palette_update_flag = 0x40
+			palette_update_flag = 0x80
 
 		writer.pack(PCS_HEADER_LAYOUT, self.width, self.height, self.framerate, self.number, state_flag, palette_update_flag, self.palette_id, len(self.objects))
 		
@@ -264,9 +294,14 @@ class PCSSegment(PGSSegment):
 	def get_segment_id() -> int:
 		return 0x16
 
+	def get_segment_length(self) -> int:
+		return PCS_HEADER_LENGTH + sum(object.get_length() for object in self.objects)
+
 
 
 class WDSWindow:
+	__slots__ = ('id', 'x', 'y', 'width', 'height')
+
 	id: int
 	"""1 byte: ID of this window"""
 	x: int
@@ -293,6 +328,7 @@ class WDSWindow:
 		return WDSWindow(*reader.unpack(WDS_WINDOW_LAYOUT))
 
 class WDSSegment(PGSSegment):
+	__slots__ = ('windows',)
 	
 	#count: int
 	#"""1 byte: Number of windows defined in this segment"""
@@ -327,9 +363,13 @@ class WDSSegment(PGSSegment):
 	def get_segment_id() -> int:
 		return 0x17
 
+	def get_segment_length(self) -> int:
+		return WDS_HEADER_LENGTH + WDS_WINDOW_LENGTH * len(self.windows)
+
 
 
 class PDSPalette:
+	__slots__ = ('id', 'lum', 'cr', 'cb', 'alpha')
 	
 	id: int
 	"""1 byte: Entry number of the palette."""
@@ -358,18 +398,58 @@ class PDSPalette:
 		writer.pack(PDS_PALETTE_LAYOUT, self.id, self.lum, self.cr, self.cb, self.alpha)
 
 class PDSSegment(PGSSegment):
+	__slots__ = ('id', 'version', '__palettes', '__palette_array')
 	
 	id: int
 	"""1 byte: ID of the palette."""
 	version: int
 	"""1 byte: Version of this palette within the Epoch."""
-	palettes: list[PDSPalette]
 
-	def __init__(self, pts: int, dts: int, id: int, version: int, palettes: list[PDSPalette] = []):
+	# the palettes are kept as the raw (n, 5) array until someone asks for the PDSPalette objects
+	# once they are created, the list is what gets written
+	__palettes: list[PDSPalette] | None
+	__palette_array: np.ndarray | None
+
+	def __init__(self, pts: int, dts: int, id: int, version: int, palettes: list[PDSPalette] | np.ndarray = []):
 		super().__init__(pts, dts)
 		self.id = id
 		self.version = version
-		self.palettes = palettes
+		if isinstance(palettes, np.ndarray):
+			self.palette_array = palettes
+		else:
+			self.palettes = palettes
+
+	@property
+	def palettes(self) -> list[PDSPalette]:
+		"""The palette entries as PDSPalette objects, they are created on first access."""
+		if self.__palettes is None:
+			self.__palettes = [PDSPalette(*entry) for entry in self.__palette_array.tolist()]
+			self.__palette_array = None
+		return self.__palettes
+
+	@palettes.setter
+	def palettes(self, palettes: list[PDSPalette]):
+		self.__palettes = palettes
+		self.__palette_array = None
+
+	@property
+	def palette_array(self) -> np.ndarray:
+		"""(n, 5) uint8 array of the palette entries: PALETTE_ID - Y - CR - CB - ALPHA"""
+		if self.__palettes is not None:
+			return np.array([(p.id, p.lum, p.cr, p.cb, p.alpha) for p in self.__palettes], dtype=np.uint8).reshape(-1, 5)
+		return self.__palette_array
+
+	@palette_array.setter
+	def palette_array(self, palette_array: np.ndarray):
+		if palette_array.ndim != 2 or palette_array.shape[1] != 5:
+			raise pgs.PGSParserException(f'palette arrays should have a (n, 5) shape, got {palette_array.shape}')
+		self.__palette_array = palette_array.astype(np.uint8, copy=False)
+		self.__palettes = None
+
+	@property
+	def palette_source(self) -> list[PDSPalette] | np.ndarray:
+		"""Whichever of the palette list or the palette array currently holds the palettes, it changes whenever the palettes are replaced."""
+		return self.__palettes if self.__palettes is not None else self.__palette_array
 
 	@staticmethod
 	def read(pts: int, dts: int, size: int, reader: pgs.PGSIO, context: 'PGSContext') -> 'PDSSegment':
@@ -379,22 +459,24 @@ class PDSSegment(PGSSegment):
 			raise pgs.PGSParserException(f'unvalid PCS segment length {size} at 0x{reader.tell() - PGS_HEADER_LENGTH}')
 		# parse the headers
 		(id, version) = reader.unpack(PDS_HEADER_LAYOUT)
-		# parse the palettes
-		palettes: list[PDSPalette] = []
-		for _ in range(size // 5):
-			palettes.append(PDSPalette.read(reader))
+		# parse all the palettes at once
+		palettes = np.zeros((0, 5), dtype=np.uint8)
+		if palette_count > 0:
+			palettes = np.frombuffer(bytes(reader.read(palette_count * PDS_PALETTE_LENGTH)), dtype=np.uint8).reshape(palette_count, 5)
 		
 		return PDSSegment(pts, dts, id, version, palettes)
 
 	def write(self, writer: pgs.PGSIO):
 		writer.pack(PDS_HEADER_LAYOUT, self.id, self.version)
-		for palette in self.palettes:
-			palette.write(writer)
+		writer.write(self.palette_array.tobytes())
 
 	@staticmethod
 	def get_segment_id() -> int:
 		return 0x14
 
+	def get_segment_length(self) -> int:
+		return PDS_HEADER_LENGTH + PDS_PALETTE_LENGTH * len(self.palette_source)
+
 
 
 class ODSPositionFlag(IntFlag):
@@ -405,6 +487,8 @@ class ODSPositionFlag(IntFlag):
 	FIRST_AND_LAST = 0b11_000000
 
 class ODSSegment(PGSSegment):
+	__slots__ = ('id', 'version', 'position_flag', 'width', 'height', 'rle_data', 'remaining_rle_length', 'expected_fragment_length', 'decoded_data', 'w_diff', 'h_diff')
+
 	id: int
 	"""2 bytes: ID of this object."""
 	version: int
@@ -423,7 +507,8 @@ class ODSSegment(PGSSegment):
 	height: int
 	"""2 bytes:	Height of the image."""
 	rle_data: bytes | list[bytes]
-	"""variable length:	This is the image data compressed using Run-length Encoding (RLE). The size of the data is defined in the DataLength field."""
+	"""variable length:	This is the image data compressed using Run-length Encoding (RLE). The size of the data is defined in the DataLength field.
+	While the object is being read this is the list of fragments read so far."""
 
 	remaining_rle_length: int
 	"""The amoutn of data that remains to be added"""
@@ -441,7 +526,7 @@ class ODSSegment(PGSSegment):
 		self.version = version
 		self.position_flag = position_flag
 		self.remaining_rle_length = remaining_rle_length
-		self.expected_fragment_length = len(data)
+		self.expected_fragment_length = sum(len(d) for d in data) if isinstance(data, list) else len(data)
 		self.width = width
 		self.height = height
 		self.rle_data = data
@@ -490,8 +575,8 @@ class ODSSegment(PGSSegment):
 			if len(data_read) != amount_to_read:
 				raise pgs.PGSParserException(f'Failed to read expected amount of bytes ({amount_to_read}) from payload of ODS segment at 0x{segment_start_pos:x}') 
 
-			# append to previous object
-			previous_object.rle_data += data_read
+			# collect the fragment, they are joined once the last one arrives
+			previous_object.rle_data.append(data_read)
 			previous_object.remaining_rle_length -= len(data_read)
 
 			# if we've reached the end check if we actually have done so and mark the ODS as finished
@@ -500,7 +585,10 @@ class ODSSegment(PGSSegment):
 				if previous_object.remaining_rle_length != 0:
 					raise pgs.PGSParserException(f"ODS fragment at 0x{segment_start_pos:x} should have completed the ODS #{id} but not all data has been read. {previous_object.remaining_rle_length} remaining to read.")
 				# mark the segment as completed
+				previous_object.join_fragments()
 				previous_object.position_flag = ODSPositionFlag.FIRST_AND_LAST
+				if context.object_store is not None:
+					context.object_store.intern(previous_object)
 			
 			return None
 		else:
@@ -534,25 +622,44 @@ class ODSSegment(PGSSegment):
 			if ODSPositionFlag.LAST in position_flag and remaining_payload_length != 0:
 				logging.debug(f"failed to read all data from first and last ODS segment @ 0x{segment_start_pos}")
 
+			# copy complete objects out of the reader, fragmented ones are collected until the last fragment arrives
+			if ODSPositionFlag.LAST in position_flag:
+				data_fragment = bytes(data_fragment)
+			else:
+				data_fragment = [data_fragment]
+
 			# return the parsed object
-			return ODSSegment(pts, dts, id, version, position_flag, width, height, data_fragment, remaining_rle_length=remaining_payload_length)
+			ods = ODSSegment(pts, dts, id, version, position_flag, width, height, data_fragment, remaining_rle_length=remaining_payload_length)
+			# the first fragment also holds the payload header, the next ones can use that space for rle data
+			ods.expected_fragment_length = size - ODS_HEADER_LENGTH
+			return ods
+
+	def join_fragments(self):
+		"""Joins the collected rle data fragments into a single bytes object."""
+		if isinstance(self.rle_data, list):
+			self.rle_data = b''.join(self.rle_data)
 
-	def get_payload_bytes(self) -> bytes:
+	def get_payload_bytes(self, with_rle_data: bool = True) -> bytes:
 		# complete data is read as length,width,height,rle_encoded_data
-		payload = pgs.PGSIO.pack_data('HH', self.width, self.height) + self.rle_data
-		payload = len(payload).to_bytes(3, 'big') + payload
+		payload = pgs.PGSIO.pack_data('HH', self.width, self.height)
+		payload = (len(payload) + len(self.rle_data)).to_bytes(3, 'big') + payload
+		if with_rle_data:
+			payload += self.rle_data
 		return payload
 
 	def serialize(self, writer: pgs.PGSIO):
-		payload = self.get_payload_bytes()
-		fragments = [payload[i:i+MAX_ODS_DATA_FRAGMENT_LEN] for i in range(0, len(payload), MAX_ODS_DATA_FRAGMENT_LEN)]
-		last_index = len(fragments) - 1
+		# the payload is length,width,height,rle_encoded_data but the rle data is written in place instead of being copied in a payload first
+		payload_header = self.get_payload_bytes(with_rle_data=False)
+		payload_length = len(payload_header) + len(self.rle_data)
+		fragment_starts = range(0, payload_length, MAX_ODS_DATA_FRAGMENT_LEN)
+		last_index = len(fragment_starts) - 1
 		base_seg_len = writer.calcsize(ODS_HEADER_LAYOUT)
-		for fragment_index, fragment_data in enumerate(fragments):
+		for fragment_index, fragment_start in enumerate(fragment_starts):
+			fragment_end = min(fragment_start + MAX_ODS_DATA_FRAGMENT_LEN, payload_length)
 			# write basic header
 			self.write_segment_header(writer)
 			# write length of current segment
-			seg_len = base_seg_len + len(fragment_data)
+			seg_len = base_seg_len + fragment_end - fragment_start
 			if seg_len > MAX_PGS_SEGMENT_LENGTH:
 				raise pgs.PGSParserException('tried to write an ODS segment that is too long.')
 			writer.pack('H', seg_len)
@@ -567,17 +674,36 @@ class ODSSegment(PGSSegment):
 			# write the ODS header
 			writer.pack(ODS_HEADER_LAYOUT, self.id, self.version, int(posFlag))
 			# write the fragment data
-			writer.write(fragment_data)
+			if fragment_index == 0:
+				writer.write(payload_header)
+			writer.write(self.rle_data[max(0, fragment_start - len(payload_header)):fragment_end - len(payload_header)])
 
 	@staticmethod
 	def get_segment_id() -> int:
 		return 0x15
 
-	def get_image(self, palette) -> Image.Image:
-		data = pgs.decode_pgs_rle(self.rle_data)
-		img = Image.frombytes('P', size=(self.width,self.height), data=b''.join(data), decoder_name='raw')
-		img.putpalette(palette, rawmode='RGBA')
-		return img
+	def get_indexes(self, cache: 'pgs.PGSImageCache | None' = None) -> np.ndarray:
+		"""Decodes the rle data to a (height, width) array of palette indexes.
+		Arrays that come from the cache are read only."""
+		if cache is not None:
+			return cache.get_indexes(self)
+		return pgs.decode_pgs_rle_array(self.rle_data, self.width, self.height)
+
+	def get_image(self, palette, cache: 'pgs.PGSImageCache | None' = None) -> Image.Image:
+		return pgs.indexes_to_image(self.get_indexes(cache), palette)
+
+	def to_rgba(self, palette: np.ndarray, out: np.ndarray | None = None, cache: 'pgs.PGSImageCache | None' = None) -> np.ndarray:
+		"""Decodes the rle data straight to a (height, width, 4) RGBA array using a (n, 4) palette like the one of segment_to_pil.
+		Indexes past the end of the palette use its last entry.
+		out can be any contiguous uint8 array with room for height * width * 4 values, so a single buffer
+		can be reused for objects of different sizes. The returned array is then a view on the start of out."""
+		indexes = self.get_indexes(cache)
+		if out is not None:
+			size = self.height * self.width * 4
+			if out.dtype != np.uint8 or not out.flags.c_contiguous or out.size < size:
+				raise ValueError(f"out needs to be a contiguous uint8 array of at least {size} values")
+			out = out.reshape(-1)[:size].reshape(self.height, self.width, 4)
+		return np.take(palette, indexes, axis=0, out=out, mode='clip')
 	
 	def __copy__(self) -> 'ODSSegment':
 		seg = ODSSegment(
@@ -599,6 +725,7 @@ class ODSSegment(PGSSegment):
 
 
 class ENDSegment(PGSSegment):
+	__slots__ = ()
 	
 	def __init__(self, pts, dts):
 		super().__init__(pts, dts)
@@ -618,6 +745,9 @@ class ENDSegment(PGSSegment):
 	def get_segment_id() -> int:
 		return 0x80
 
+	def get_segment_length(self) -> int:
+		return 0
+
 
 
 PGS_SEGMENT_TYPE_RESOLVER: dict[int, PDSSegment|ODSSegment|PCSSegment|WDSSegment|ENDSegment] = {
@@ -629,6 +759,8 @@ PGS_SEGMENT_TYPE_RESOLVER: dict[int, PDSSegment|ODSSegment|PCSSegment|WDSSegment
 }
 
 class PGSDisplaySet:
+	__slots__ = ('id', 'pcs', 'wds', 'pds', 'ods', 'end')
+
 	id: int
 	pcs: PCSSegment
 	wds: WDSSegment
@@ -671,9 +803,12 @@ class PGSDisplaySet:
 
 class PGSFile:
 	display_sets: list[PGSDisplaySet]
+	skipped_ranges: list[tuple[int, int]]
+	"""start - end byte ranges of the data that was skipped when the file was read in recovery mode."""
 
 	def __init__(self, segments: list[PGSSegment]):
 		self.segments = []
+		self.skipped_ranges = []
 		
 		self.display_sets = []
 		curr_display_set = []
@@ -684,42 +819,124 @@ class PGSFile:
 				curr_display_set = []
 
 	
-	def save_images(self, out_dir):
+	def save_images(self, out_dir, cache: 'pgs.PGSImageCache | None' = None, workers: int | None = None, use_threads: bool = False, max_in_flight: int | None = None, palette_updates: bool = False):
 		"""
 		images are dumped with file names that represent
 		{ds.id}.{ods.id} - {mm}.{ss}.{fff}.png
+
+		when workers is more than 1 the images are decoded and encoded in a process pool (or a thread pool if use_threads is set),
+		at most max_in_flight images (4 per worker by default) are waiting on the pool at any time.
+
+		when palette_updates is set, palette only display sets are dumped as well, using the objects of their epoch with the new palette.
+		the decoded objects come from the cache so only the palette gets applied again.
 		"""
+		if cache is None:
+			cache = pgs.PGSImageCache()
+
+		# the palettes have to be resolved in order, so the context is always walked serially
+		jobs = (
+			# objects shown again by a palette update are named after the update
+			(ods, cache.get_palette(palette), path.join(out_dir, f'{ds.id}-{ods.id} - {PGSFile.format_pts(ods.pts if ds.ods else ds.pcs.pts)}.png'))
+			for (ds, palette, objects) in self.iter_display_set_objects(palette_updates)
+			for ods in objects
+		)
+
+		# objects sharing their rle data (see PGSObjectStore) with the same palette are only encoded once, then copied
+		saved: dict[tuple[int, int, int, int], tuple[typing.Any, np.ndarray, str]] = {}
+		def find_saved(ods: ODSSegment, palette: np.ndarray, save_path: str) -> str | None:
+			key = (ods.width, ods.height, id(ods.rle_data), id(palette))
+			entry = saved.get(key)
+			if entry is not None and entry[0] is ods.rle_data and entry[1] is palette:
+				return entry[2]
+			saved[key] = (ods.rle_data, palette, save_path)
+			return None
+
+		if workers is None or workers <= 1:
+			for (ods, palette, save_path) in jobs:
+				if (saved_path := find_saved(ods, palette, save_path)) is not None:
+					shutil.copyfile(saved_path, save_path)
+				else:
+					ods.get_image(palette, cache).save(save_path)
+			return
+
+		if max_in_flight is None:
+			max_in_flight = workers * 4
+		copies: list[tuple[str, str]] = []
+		pool_type = multiprocessing.pool.ThreadPool if use_threads else multiprocessing.Pool
+		with pool_type(workers) as pool:
+			in_flight: deque[multiprocessing.pool.AsyncResult] = deque()
+			for (ods, palette, save_path) in jobs:
+				if (saved_path := find_saved(ods, palette, save_path)) is not None:
+					# the original might not be written yet
+					copies.append((saved_path, save_path))
+					continue
+				in_flight.append(pool.apply_async(_save_image_job, ((ods.rle_data, palette, (ods.width, ods.height), save_path),)))
+				# wait on the oldest job to keep the memory usage bounded
+				if len(in_flight) >= max_in_flight:
+					in_flight.popleft().get()
+			while in_flight:
+				in_flight.popleft().get()
+			pool.close()
+			pool.join()
+		for (saved_path, save_path) in copies:
+			shutil.copyfile(saved_path, save_path)
+
+	def build_timeline(self) -> 'pgs.PGSTimeline':
+		"""Builds an interval index of what is on screen when. Build it once and reuse it, it isn't updated when the file changes."""
+		return pgs.PGSTimeline.from_display_sets(self.display_sets)
+
+	def iter_display_set_palettes(self) -> typing.Iterator[tuple[PGSDisplaySet, PDSSegment]]:
+		"""Yields every display set that has objects along with the palette it uses."""
+		for (ds, palette, _) in self.iter_display_set_objects():
+			yield (ds, palette)
+
+	def iter_display_set_objects(self, palette_updates: bool = False) -> typing.Iterator[tuple[PGSDisplaySet, PDSSegment, list[ODSSegment]]]:
+		"""Yields every display set that has objects along with the palette it uses and its objects.
+		When palette_updates is set, palette only display sets are yielded too, with the objects of the epoch they show."""
 		context = PGSContext()
 		for ds in self.display_sets:
 			context.update(ds)
 			if len(ds.ods) > 0:
-				if ds.pcs.palette_id not in context.palettes:
-					raise pgs.PGSParserException(f'bad palette id found: {ds.pcs.palette_id}')
-				for ods in ds.ods.values():
-					mins = math.floor((ods.pts / 90000) / 60)
-					secs = math.floor((ods.pts / 90000) % 60)
-					ms = math.floor((ods.pts / 90) % 1000)
-					save_path = path.join(out_dir, f'{ds.id}-{ods.id} - {mins:02d}.{secs:02d}.{ms:03d}.png')
-					ods.get_image(pgs.segment_to_pil(context.palettes[ds.pcs.palette_id])).save(save_path)
-
-	def write(self) -> bytes:
+				objects = list(ds.ods.values())
+			elif palette_updates and ds.pcs.is_palette_only_update:
+				objects = [context.images[obj.object_id] for obj in ds.pcs.objects if obj.object_id in context.images]
+				if not objects:
+					continue
+			else:
+				continue
+			if ds.pcs.palette_id not in context.palettes:
+				raise pgs.PGSParserException(f'bad palette id found: {ds.pcs.palette_id}')
+			yield (ds, context.palettes[ds.pcs.palette_id], objects)
 
-		with pgs.PGSIO() as writer:
-			# write the segments
-			for ds in self.display_sets:
-				ds.write(writer)
+	@staticmethod
+	def format_pts(pts: int) -> str:
+		"""Formats a timestamp as {mm}.{ss}.{fff}"""
+		mins = math.floor((pts / 90000) / 60)
+		secs = math.floor((pts / 90000) % 60)
+		ms = math.floor((pts / 90) % 1000)
+		return f'{mins:02d}.{secs:02d}.{ms:03d}'
 
-			# output the data
-			writer.seek(0)
-			return writer.read()
+	def write(self) -> bytes:
+		with BytesIO() as buffer:
+			with PGSWriter(buffer) as writer:
+				writer.write_all(self.display_sets)
+			return buffer.getvalue()
 		
+def _save_image_job(job: tuple[bytes, np.ndarray, tuple[int, int], str]):
+	"""Worker side of PGSFile.save_images"""
+	(rle_data, palette, (width, height), save_path) = job
+	pgs.indexes_to_image(pgs.decode_pgs_rle_array(rle_data, width, height), palette).save(save_path)
+
 class PGSContext:
 	pcs: PCSSegment
 	images: dict[int, ODSSegment]
 	palettes: dict[int, PDSSegment]
 	windows: dict[int, WDSWindow]
+	object_store: 'pgs.PGSObjectStore | None'
+	"""Complete objects are interned in it when set."""
 
-	def __init__(self):
+	def __init__(self, object_store: 'pgs.PGSObjectStore | None' = None):
+		self.object_store = object_store
 		self.pcs = None
 		self.images = {}
 		self.palettes = {}
@@ -743,41 +960,197 @@ class PGSContext:
 			if PCSState.EPOCH_START in segment.state:
 				self.begin_new_epoch()
 			self.pcs = segment
+		elif isinstance(segment, WDSSegment):
+			for window in segment.windows:
+				self.windows[window.id] = window
 		elif isinstance(segment, PDSSegment):
 			self.palettes[segment.id] = segment
 			if len(self.palettes) > 8:
 				raise pgs.PGSParserException('PGS epochs have a limit of 8 palettes.')
 		elif isinstance(segment, ODSSegment):
+			# fragmented objects get interned once their last fragment is read
+			if self.object_store is not None and segment.position_flag == ODSPositionFlag.FIRST_AND_LAST and not isinstance(segment.rle_data, list):
+				self.object_store.intern(segment)
 			self.images[segment.id] = segment
 			if len(self.images) > 64:
 				raise pgs.PGSParserException('PGS epochs have a limit of 64 items for some reason... why is the object id a 2 byte thing then...')
 
+class PGSWriter:
+	"""Writes display sets to a binary stream (file, pipe, stdin of a process...) one at a time.
+	Nothing but the segment being written is buffered and the stream is not closed with the writer."""
+	__writer: pgs.PGSStreamIO
+
+	def __init__(self, stream: typing.BinaryIO):
+		self.__writer = pgs.PGSStreamIO(stream)
+
+	def __enter__(self) -> 'PGSWriter':
+		return self
+
+	def __exit__(self, exec_type, exec_value, traceback):
+		self.close()
+
+	def tell(self) -> int:
+		"""The amount of bytes written so far."""
+		return self.__writer.tell()
+
+	def write(self, display_set: PGSDisplaySet):
+		display_set.write(self.__writer)
+
+	def write_all(self, display_sets: typing.Iterable[PGSDisplaySet]):
+		for display_set in display_sets:
+			self.write(display_set)
+
+	def close(self):
+		self.__writer.close()
+
 class PGSParser:
-		
 
 	@staticmethod
-	def read_from_bytes(bytes) -> PGSFile:
-		with pgs.PGSIO(bytes, True) as reader:
+	def read_from_file(file_path, object_store: 'pgs.PGSObjectStore | None' = None, recover: bool = False) -> PGSFile:
+		"""Parses a file by memory mapping it instead of reading it all in memory first."""
+		with pgs.map_file(file_path) as mapped:
+			return PGSParser.read_from_bytes(mapped, object_store, recover)
+
+	@staticmethod
+	def read_from_bytes(bytes, object_store: 'pgs.PGSObjectStore | None' = None, recover: bool = False) -> PGSFile:
+		"""When an object store is given, objects with the same content share their rle data buffer.
+		When recover is set, damaged data doesn't raise: the display sets it breaks are dropped, reading resumes at the next
+		plausible PCS header and the byte ranges that were dropped are reported in skipped_ranges of the result."""
+		skipped_ranges = []
+		with pgs.PGSBufferIO(bytes) as reader:
 			# read segments
-			segments = []
-			context = PGSContext()
-			while reader.can_read():
-				# read the segment
-				ret = PGSSegment.read(reader, context)
-				# append the segment if we got one (we don't get any when it's a subsequent ODS segment)
-				if isinstance(ret, PGSSegment):
-					context.update(ret)
-					segments.append(ret)
-				elif not (ret is None):
-					raise pgs.PGSParserException(f'got an unexpected object type while parsing PGS segments: {str(type(ret))}')
-					
+			if recover:
+				segments = _read_segments_recovering(reader, PGSContext(object_store), skipped_ranges)
+			else:
+				segments = list(PGSParser.iter_segments(reader, PGSContext(object_store)))
+
+			# objects that never got their last fragment shouldn't keep references to the reader's buffer
+			for segment in segments:
+				if isinstance(segment, ODSSegment):
+					segment.join_fragments()
 			
 		# the last segment should always be an end segment
 		if len(segments) > 0 and not isinstance(segments[-1], ENDSegment):
 			raise pgs.PGSParserException('final segment should always be an end segment')
 		
-		return PGSFile(segments)
-	
-	
-		
-	
\ No newline at end of file
+		pgs_file = PGSFile(segments)
+		pgs_file.skipped_ranges = skipped_ranges
+		return pgs_file
+
+	@staticmethod
+	def iter_segments(reader: pgs.PGSIO, context: PGSContext, end: int | None = None) -> typing.Iterator[PGSSegment]:
+		"""Reads segments until the reader runs out of data or reaches the end offset, updating the context as it goes."""
+		while reader.can_read() and (end is None or reader.tell() < end):
+			# read the segment
+			ret = PGSSegment.read(reader, context)
+			# yield the segment if we got one (we don't get any when it's a subsequent ODS segment)
+			if isinstance(ret, PGSSegment):
+				context.update(ret)
+				yield ret
+			elif not (ret is None):
+				raise pgs.PGSParserException(f'got an unexpected object type while parsing PGS segments: {str(type(ret))}')
+
+	@staticmethod
+	def iter_display_sets(source, object_store: 'pgs.PGSObjectStore | None' = None) -> typing.Iterator[PGSDisplaySet]:
+		"""Yields display sets as soon as their END segment has been read.
+		The source can be bytes like, a path or a binary stream (file, pipe, stdout of a process...).
+		Only the state of the current epoch is kept in memory, plus the unique bitmaps when an object store is given."""
+		if isinstance(source, (str, os.PathLike)):
+			with open(source, 'rb') as f:
+				yield from PGSParser.iter_display_sets(f, object_store)
+			return
+
+		if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+			reader = pgs.PGSBufferIO(source)
+		else:
+			reader = pgs.PGSStreamIO(source)
+
+		with reader:
+			display_set_count = 0
+			curr_display_set = []
+			for segment in PGSParser.iter_segments(reader, PGSContext(object_store)):
+				curr_display_set.append(segment)
+				if isinstance(segment, ENDSegment):
+					display_set = PGSDisplaySet(curr_display_set, display_set_count)
+					for ods in display_set.ods.values():
+						ods.join_fragments()
+					yield display_set
+					display_set_count += 1
+					curr_display_set = []
+
+		# the last segment should always be an end segment
+		if len(curr_display_set) > 0:
+			raise pgs.PGSParserException('final segment should always be an end segment')
+
+def _read_segments_recovering(reader: pgs.PGSBufferIO, context: PGSContext, skipped_ranges: list[tuple[int, int]]) -> list[PGSSegment]:
+	"""PGSParser.iter_segments for damaged data: when a segment can't be read, the display set it is part of is dropped
+	and reading resumes at the next plausible PCS header. Only the segments of complete display sets are returned."""
+	segments: list[PGSSegment] = []
+	display_set: list[PGSSegment] = []
+	display_set_start = 0
+
+	def skip(start: int, end: int):
+		nonlocal display_set
+		display_set = []
+		# objects of the dropped display set may still be waiting on fragments that will never come
+		for id in [id for (id, ods) in context.images.items() if isinstance(ods.rle_data, list)]:
+			del context.images[id]
+		if skipped_ranges and skipped_ranges[-1][1] == start:
+			skipped_ranges[-1] = (skipped_ranges[-1][0], end)
+		else:
+			skipped_ranges.append((start, end))
+
+	while reader.can_read():
+		segment_start = reader.tell()
+		if not display_set:
+			display_set_start = segment_start
+		try:
+			segment = PGSSegment.read(reader, context)
+			if segment is None:
+				continue
+			if isinstance(segment, PCSSegment) and any(isinstance(s, PCSSegment) for s in display_set):
+				# the previous display set never got its END segment
+				skip(display_set_start, segment_start)
+				display_set_start = segment_start
+			context.update(segment)
+			display_set.append(segment)
+			if isinstance(segment, ENDSegment):
+				# checks the amount of PCS, WDS and END segments
+				PGSDisplaySet(display_set, 0)
+				segments += display_set
+				display_set = []
+		except (pgs.PGSParserException, pgs.PGSIOException):
+			resume = _find_plausible_pcs(reader, segment_start + 1)
+			skip(display_set_start, resume)
+			reader.seek(resume)
+
+	if display_set:
+		skip(display_set_start, reader.tell())
+	return segments
+
+def _find_plausible_pcs(reader: pgs.PGSBufferIO, start: int) -> int:
+	"""Offset of the next PCS segment header that looks valid and is followed by another segment or the end of the data,
+	the length of the data when there is none. The position of the reader is restored."""
+	position = reader.tell()
+	length = len(reader)
+	try:
+		while (candidate := reader.find(PGS_MAGIC_VALUE, start)) != -1:
+			start = candidate + 1
+			if candidate + PGS_HEADER_LENGTH + PCS_HEADER_LENGTH > length:
+				break
+			reader.seek(candidate)
+			(_, _, _, segment_type, size) = reader.unpack(PGS_HEADER_LAYOUT)
+			if segment_type != PCSSegment.get_segment_id() or size not in PCS_PLAUSIBLE_LENGTHS:
+				continue
+			end = candidate + PGS_HEADER_LENGTH + size
+			if end > length:
+				continue
+			state_flag = reader.unpack(PCS_HEADER_LAYOUT)[4]
+			if state_flag not in PCSState.__members__.values():
+				continue
+			reader.seek(end)
+			if end == length or (reader.can_read(2) and reader.read(2) == PGS_MAGIC_VALUE):
+				return candidate
+		return length
+	finally:
+		reader.seek(position)
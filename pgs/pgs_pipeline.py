@@ -0,0 +1,146 @@
+from collections import deque
+from multiprocessing import shared_memory, resource_tracker
+import multiprocessing
+import multiprocessing.pool
+import sys
+import typing
+import numpy as np
+import pgs
+from .pgs_parser import ODSSegment, PGSFile
+
+PGSObjectTransform = typing.Callable[[np.ndarray, np.ndarray], np.ndarray]
+"""Takes the (height, width) palette indexes of an object and the (256, 4) RGBA palette it is shown with,
+returns the new (height, width) palette indexes of the object, which can be of a different size."""
+
+def transform_objects(pgs_file: PGSFile, transform: PGSObjectTransform, workers: int | None = None, max_in_flight: int | None = None) -> int:
+	"""Applies transform to the bitmap of every object of the file and replaces their rle data with the encoded result.
+	The palettes are resolved by walking the epochs in order, the objects are then decoded in this process and handed to a process pool
+	through shared memory, where they get transformed and encoded again. Only the encoded result comes back, and results are applied in stream order.
+	At most max_in_flight objects (4 per worker by default) are waiting on the pool at any time.
+	With workers unset or 1 everything runs in this process. In a pool, transform has to be picklable (a module level function).
+	Objects sharing their rle data and palette (see PGSObjectStore) are only transformed once, to tell them apart the original rle data
+	of every object is kept alive until the call returns, so that part of the memory usage grows with the file.
+	ods.w_diff and ods.h_diff are set to how much the size of each object changed. Returns the amount of objects transformed."""
+	# only the palettes are cached, repeated bitmaps are already handled by done so decoded bitmaps are almost never used twice
+	cache = pgs.PGSImageCache(max_bytes=0)
+	jobs = (
+		(ods, cache.get_palette(palette))
+		for (_, palette, objects) in pgs_file.iter_display_set_objects()
+		for ods in objects
+	)
+
+	# objects that share their rle data with the same palette share the result
+	done: dict[tuple[int, int], tuple[typing.Any, np.ndarray, ODSSegment]] = {}
+	def find_done(ods: ODSSegment, palette: np.ndarray) -> ODSSegment | None:
+		key = (id(ods.rle_data), id(palette))
+		entry = done.get(key)
+		if entry is not None and entry[0] is ods.rle_data and entry[1] is palette:
+			return entry[2]
+		done[key] = (ods.rle_data, palette, ods)
+		return None
+
+	count = 0
+	if workers is None or workers <= 1:
+		for (ods, palette) in jobs:
+			if (original := find_done(ods, palette)) is not None:
+				_copy_result(original, ods)
+			else:
+				indexes = transform(ods.get_indexes(), palette)
+				_apply_result(ods, indexes.shape[1], indexes.shape[0], pgs.encode_pgs_rle_array(indexes))
+			count += 1
+		return count
+
+	if max_in_flight is None:
+		max_in_flight = workers * 4
+	in_flight: deque[tuple[ODSSegment, shared_memory.SharedMemory | None, multiprocessing.pool.AsyncResult | ODSSegment]] = deque()
+
+	def finish_oldest():
+		(ods, shm, result) = in_flight.popleft()
+		if shm is None:
+			# a duplicate of an object that is further up the queue, so already done
+			_copy_result(result, ods)
+			return
+		try:
+			_apply_result(ods, *result.get())
+		finally:
+			shm.close()
+			shm.unlink()
+
+	# the workers have to share the resource tracker of this process so the blocks they open are only tracked once,
+	# forked workers only do when it is already running
+	resource_tracker.ensure_running()
+	with multiprocessing.Pool(workers) as pool:
+		try:
+			for (ods, palette) in jobs:
+				count += 1
+				if (original := find_done(ods, palette)) is not None:
+					in_flight.append((ods, None, original))
+					continue
+				shm = shared_memory.SharedMemory(create=True, size=max(1, ods.width * ods.height))
+				try:
+					shared = np.ndarray((ods.height, ods.width), dtype=np.uint8, buffer=shm.buf)
+					shared[...] = ods.get_indexes()
+					del shared
+					result = pool.apply_async(_transform_job, ((transform, shm.name, ods.width, ods.height, palette),))
+				except BaseException:
+					shm.close()
+					shm.unlink()
+					raise
+				in_flight.append((ods, shm, result))
+				# wait on the oldest job to keep the memory usage bounded
+				if len(in_flight) >= max_in_flight:
+					finish_oldest()
+			while in_flight:
+				finish_oldest()
+		finally:
+			# when something failed, let the jobs that were handed out finish before freeing their shared memory,
+			# terminating a pool while it is still handing out jobs can hang
+			for (_, shm, result) in in_flight:
+				if shm is not None:
+					result.wait()
+					shm.close()
+					shm.unlink()
+		pool.close()
+		pool.join()
+	return count
+
+def _apply_result(ods: ODSSegment, width: int, height: int, rle_data: bytes):
+	ods.w_diff = width - ods.width
+	ods.h_diff = height - ods.height
+	ods.width = width
+	ods.height = height
+	ods.rle_data = rle_data
+	ods.decoded_data = None
+
+def _copy_result(original: ODSSegment, ods: ODSSegment):
+	ods.w_diff = original.w_diff
+	ods.h_diff = original.h_diff
+	ods.width = original.width
+	ods.height = original.height
+	ods.rle_data = original.rle_data
+	ods.decoded_data = None
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+	"""Opens a block made by the parent process, which stays in charge of unlinking it."""
+	if sys.version_info >= (3, 13):
+		return shared_memory.SharedMemory(name=name, track=False)
+	# before 3.13 opening a block registers it again, but pool workers share the resource tracker of the parent
+	# where the name is already registered, so the parent's unlink still clears it
+	return shared_memory.SharedMemory(name=name)
+
+def _transform_job(job: tuple[PGSObjectTransform, str, int, int, np.ndarray]) -> tuple[int, int, bytes]:
+	"""Worker side of transform_objects"""
+	(transform, shm_name, width, height, palette) = job
+	shm = _attach_shared_memory(shm_name)
+	indexes = None
+	try:
+		indexes = transform(np.ndarray((height, width), dtype=np.uint8, buffer=shm.buf), palette)
+		(height, width) = indexes.shape
+		return (width, height, pgs.encode_pgs_rle_array(indexes))
+	finally:
+		del indexes
+		try:
+			shm.close()
+		except BufferError:
+			# the transform kept a view of the buffer, the mapping goes away with it
+			pass
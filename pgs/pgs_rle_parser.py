@@ -1,11 +1,19 @@
 import struct
+import numpy as np
 
 
+MAX_PGS_RLE_RUN_LENGTH = 0x3fff
+"""The longest run that can be stored in a single rle code."""
+
 def encode_pgs_rle(decoded: list[bytes]) -> bytes:
 	# empty results always return empty
 	decoded = decoded.copy()
 	if len(decoded) <= 0: return b'\x00\x00'
 
+	# byte string lines of equal length are an image, let numpy handle those. other lines (lists of ints...) go through the loop
+	if all(isinstance(line, (bytes, bytearray)) and len(line) == len(decoded[0]) for line in decoded):
+		return encode_pgs_rle_array(np.frombuffer(b''.join(decoded), dtype=np.uint8).reshape(len(decoded), len(decoded[0])))
+
 	writer = b''
 	for line in decoded:
 		x = 0
@@ -93,6 +101,74 @@ def encode_pgs_rle_old(decoded: list[bytes]) -> bytes:
 		writer += b'\x00\x00'
 	return writer
 
+def encode_pgs_rle_array(decoded: np.ndarray) -> bytes:
+	"""Encodes a (height, width) array of palette indexes. The output is identical to encode_pgs_rle."""
+	# empty results always return empty
+	if decoded.ndim != 2:
+		raise ValueError(f'expected a (height, width) array but got one with shape {decoded.shape}')
+	(height, width) = decoded.shape
+	if height <= 0: return b'\x00\x00'
+	if width <= 0: return b'\x00\x00' * height
+	decoded = np.ascontiguousarray(decoded, dtype=np.uint8)
+
+	# find where the runs start, every line starts a new run
+	run_starts = np.ones((height, width), dtype=bool)
+	run_starts[:,1:] = np.diff(decoded, axis=1) != 0
+	starts = np.flatnonzero(run_starts)
+	lengths = np.diff(starts, append=height * width)
+	colors = decoded.reshape(-1)[starts]
+	rows = starts // width
+
+	# split runs that can't fit in a single code
+	if lengths.max() > MAX_PGS_RLE_RUN_LENGTH:
+		splits = -(-lengths // MAX_PGS_RLE_RUN_LENGTH)
+		colors = np.repeat(colors, splits)
+		rows = np.repeat(rows, splits)
+		first_split = np.cumsum(splits) - splits
+		split_index = np.arange(len(colors)) - np.repeat(first_split, splits)
+		lengths = np.minimum(np.repeat(lengths, splits) - split_index * MAX_PGS_RLE_RUN_LENGTH, MAX_PGS_RLE_RUN_LENGTH)
+
+	# the size of every code
+	is_zero = colors == 0
+	is_long = lengths >= 64
+	sizes = np.where(is_zero, np.where(is_long, 3, 2), np.where(is_long, 4, np.where(lengths >= 3, 3, lengths)))
+
+	# each code is offset by the codes before it and by the end of line markers of the previous lines
+	offsets = np.cumsum(sizes) - sizes + rows * 2
+	total_length = int(sizes.sum()) + height * 2
+
+	# every code starts with 0x00 unless it's a 1-2 pixel color run, and end of line markers are 0x00 0x00
+	# so only the non zero bytes need to be written
+	writer = bytearray(total_length)
+	view = np.frombuffer(writer, dtype=np.uint8)
+	low = (lengths & 0xff).astype(np.uint8)
+	high = (lengths >> 8).astype(np.uint8)
+
+	# 0b0000_0000 0b00LL_LLLL = L pixels in color 0
+	mask = is_zero & ~is_long
+	view[offsets[mask] + 1] = low[mask]
+	# 0b0000_0000 0b01LL_LLLL 0bLLLL_LLLL = L pixels in color 0
+	mask = is_zero & is_long
+	view[offsets[mask] + 1] = 0x40 | high[mask]
+	view[offsets[mask] + 2] = low[mask]
+	# 0bCCCC_CCCC = 1 pixel of color C, 0bCCCC_CCCC 0bCCCC_CCCC = 2 pixels of color C
+	mask = ~is_zero & (lengths < 3)
+	view[offsets[mask]] = colors[mask]
+	mask = ~is_zero & (lengths == 2)
+	view[offsets[mask] + 1] = colors[mask]
+	# 0b0000_0000 0b10LL_LLLL 0xCCCC_CCCC = L pixels in color C
+	mask = ~is_zero & (lengths >= 3) & ~is_long
+	view[offsets[mask] + 1] = 0x80 | low[mask]
+	view[offsets[mask] + 2] = colors[mask]
+	# 0b0000_0000 0b11LL_LLLL 0bLLLL_LLLL 0xCCCC_CCCC = L pixels in color C
+	mask = ~is_zero & is_long
+	view[offsets[mask] + 1] = 0xc0 | high[mask]
+	view[offsets[mask] + 2] = low[mask]
+	view[offsets[mask] + 3] = colors[mask]
+
+	del view
+	return bytes(writer)
+
 def decode_pgs_rle(ods_bytes: bytes) -> list[bytes]:
 	lines = []
 	buffer = []
@@ -132,4 +208,88 @@ def decode_pgs_rle(ods_bytes: bytes) -> list[bytes]:
 
 	for i in range(0, len(lines)):
 		lines[i] = bytes(lines[i])
-	return lines
\ No newline at end of file
+	return lines
+
+def decode_pgs_rle_array(ods_bytes: bytes, width: int, height: int) -> np.ndarray:
+	"""Decodes the rle data straight into a (height, width) array of palette indexes.
+	Lines that are too short are padded with palette 0 and lines that are too long are truncated."""
+	(colors, lengths, line_ends) = _parse_rle_codes(ods_bytes)
+
+	decoded = np.zeros((height, width), dtype=np.uint8)
+
+	# well formed images (every line is exactly width long) can be expanded in a single go
+	if len(line_ends) == height:
+		line_offsets = np.concatenate(([0], np.cumsum(lengths)))[np.concatenate(([0], line_ends))]
+		if np.all(np.diff(line_offsets) == width):
+			decoded.reshape(-1)[:] = np.repeat(colors, lengths)[:width * height]
+			return decoded
+
+	# otherwise expand line by line
+	start = 0
+	for y, line_end in enumerate(line_ends[:height].tolist()):
+		line = np.repeat(colors[start:line_end], lengths[start:line_end])[:width]
+		decoded[y, :len(line)] = line
+		start = line_end
+	return decoded
+
+def _parse_rle_codes(ods_bytes: bytes) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+	"""Parses the run table without touching the pixels.
+	Returns the color and length of every run, and for every end of line the amount of runs before it."""
+	end = len(ods_bytes)
+	# padded so the bytes of a code cut short by the end of the data can be read, they read as 0
+	buf = np.zeros(end + 4, dtype=np.uint8)
+	buf[:end] = np.frombuffer(ods_bytes, dtype=np.uint8)
+
+	# every code that isn't a 1 pixel color starts with 0x00, but 0x00 can also be a length or a color inside those codes.
+	# the first 0x00 is always the start of a code, and the one after it is the first 0x00 past the end of its code,
+	# so the real codes are the chain of zeros starting at the first one
+	zeros = np.flatnonzero(buf[:end] == 0)
+	check = buf[zeros + 1]
+	code_lengths = np.where(check < 64, 2, np.where(check < 192, 3, 4))
+	# the next zero in the chain is the first one past the end of the code, codes are at most 4 bytes so at most 3 zeros are skipped.
+	# len(zeros) marks the end of the chain
+	code_ends = zeros + code_lengths
+	padded_zeros = np.append(zeros, [end + 4] * 3)
+	jumps = np.arange(1, len(zeros) + 1)
+	for offset in range(3):
+		jumps += padded_zeros[offset + 1:offset + 1 + len(zeros)] < code_ends
+	jumps = np.append(jumps, len(zeros))
+
+	# a zero that no code of the zeros right before it could cover is always on the chain, which cuts the chain
+	# in short pieces that pointer jumping can follow in a few steps, doubling the known part of the chain at each one
+	anchors = np.ones(len(zeros), dtype=bool)
+	for offset in range(1, 4):
+		anchors[offset:] &= code_ends[:-offset] <= zeros[offset:]
+	on_chain = np.append(anchors, False)
+	longest_piece = int(np.bincount(np.cumsum(anchors)).max()) if len(zeros) else 1
+	for _ in range(longest_piece.bit_length()):
+		on_chain[jumps[on_chain]] = True
+		jumps = jumps[jumps]
+	escapes = zeros[on_chain[:-1]]
+	check = check[on_chain[:-1]]
+	code_lengths = code_lengths[on_chain[:-1]]
+
+	# 0b0000_0000 0b00LL_LLLL = L pixels in color 0, 0x00 0x00 = end of line
+	# 0b0000_0000 0b01LL_LLLL 0bLLLL_LLLL = L pixels in color 0
+	# 0b0000_0000 0b10LL_LLLL 0xCCCC_CCCC = L pixels in color C
+	# 0b0000_0000 0b11LL_LLLL 0bLLLL_LLLL 0xCCCC_CCCC = L pixels in color C
+	run_type = check >> 6
+	escape_lengths = np.where(run_type & 1, ((check & 0x3f).astype(np.intp) << 8) | buf[escapes + 2], check & 0x3f)
+	escape_colors = np.where(run_type == 2, buf[escapes + 2], np.where(run_type == 3, buf[escapes + 3], 0))
+
+	# every byte that isn't inside one of those codes starts a code: escapes start with 0x00, the others are a single pixel of their color
+	covered = np.zeros(end + 4, dtype=bool)
+	for offset in range(1, 4):
+		covered[escapes[code_lengths > offset] + offset] = True
+	starts = np.flatnonzero(~covered[:end])
+	colors = buf[starts]
+	is_escape = colors == 0
+	lengths = np.ones(len(starts), dtype=np.intp)
+	lengths[is_escape] = escape_lengths
+	colors[is_escape] = escape_colors
+	is_line_end = np.zeros(len(starts), dtype=bool)
+	is_line_end[is_escape] = check == 0
+
+	is_run = ~is_line_end
+	line_ends = np.cumsum(is_run)[is_line_end]
+	return (colors[is_run], lengths[is_run], line_ends)
@@ -0,0 +1,113 @@
+from bisect import bisect_left, bisect_right
+import typing
+import pgs
+from .pgs_parser import PCSObject, ODSSegment, PDSSegment, WDSWindow, PGSDisplaySet, PGSContext
+
+if typing.TYPE_CHECKING:
+	from .pgs_index import PGSIndex
+
+class PGSActiveObject:
+	"""A composition object along with the segments it refers to in the epoch it is shown in."""
+	pcs_object: PCSObject
+	ods: ODSSegment | None
+	"""The object to show, None if the stream never defined it."""
+	pds: PDSSegment | None
+	"""The palette used by the composition, None if the stream never defined it."""
+	window: WDSWindow | None
+	"""The window the object is drawn in, None if the stream never defined it."""
+
+	def __init__(self, pcs_object: PCSObject, ods: ODSSegment | None, pds: PDSSegment | None, window: WDSWindow | None):
+		self.pcs_object = pcs_object
+		self.ods = ods
+		self.pds = pds
+		self.window = window
+
+class PGSTimelineEntry:
+	"""What is on screen from the start of a display set until the next one replaces it."""
+	start: int
+	"""PTS of the display set."""
+	end: int | None
+	"""PTS of the next display set, None for the last one."""
+	display_set: PGSDisplaySet
+	objects: list[PGSActiveObject]
+	"""Empty when the display set clears the screen."""
+
+	def __init__(self, start: int, end: int | None, display_set: PGSDisplaySet, objects: list[PGSActiveObject]):
+		self.start = start
+		self.end = end
+		self.display_set = display_set
+		self.objects = objects
+
+	@staticmethod
+	def resolve(display_set: PGSDisplaySet, end: int | None, context: PGSContext) -> 'PGSTimelineEntry':
+		"""Makes the entry of a display set, the context must have been updated with it."""
+		pds = context.palettes.get(display_set.pcs.palette_id)
+		objects = [
+			PGSActiveObject(obj, context.images.get(obj.object_id), pds, context.windows.get(obj.window_id))
+			for obj in display_set.pcs.objects
+		]
+		return PGSTimelineEntry(display_set.pcs.pts, end, display_set, objects)
+
+class PGSTimeline:
+	"""Interval index over the display sets of a stream. Every display set is on screen from its PTS until the next display set's PTS.
+	Lookups are a bisect over the start times, entries are either all resolved up front or resolved when asked for."""
+	__starts: list[int]
+	__resolver: typing.Callable[[range], list[PGSTimelineEntry]]
+
+	def __init__(self, starts: list[int], resolver: typing.Callable[[range], list[PGSTimelineEntry]]):
+		self.__starts = starts
+		self.__resolver = resolver
+
+	def __len__(self) -> int:
+		return len(self.__starts)
+
+	@staticmethod
+	def from_display_sets(display_sets: typing.Iterable[PGSDisplaySet]) -> 'PGSTimeline':
+		display_sets = list(display_sets)
+		starts = [ds.pcs.pts for ds in display_sets]
+		entries: list[PGSTimelineEntry] = []
+		context = PGSContext()
+		for i, ds in enumerate(display_sets):
+			context.update(ds)
+			entries.append(PGSTimelineEntry.resolve(ds, starts[i + 1] if i + 1 < len(starts) else None, context))
+		return PGSTimeline(starts, lambda indexes: entries[indexes.start:indexes.stop])
+
+	@staticmethod
+	def from_index(index: 'PGSIndex', source) -> 'PGSTimeline':
+		"""Makes a timeline that only decodes the display sets a query needs out of the source the index was made from."""
+		starts = index.entries['pts'].tolist()
+		def resolver(indexes: range) -> list[PGSTimelineEntry]:
+			entries: list[PGSTimelineEntry] = []
+			context = PGSContext()
+			for ds in index.iter_display_sets(source, indexes):
+				context.update(ds)
+				if ds.id in indexes:
+					entries.append(PGSTimelineEntry.resolve(ds, starts[ds.id + 1] if ds.id + 1 < len(starts) else None, context))
+			return entries
+		return PGSTimeline(starts, resolver)
+
+	def entry_at(self, pts: int) -> PGSTimelineEntry | None:
+		"""The display set on screen at pts, None if pts is before the first one."""
+		i = bisect_right(self.__starts, pts) - 1
+		if i < 0:
+			return None
+		return self.__resolver(range(i, i + 1))[0]
+
+	def at(self, pts: int) -> list[PGSActiveObject]:
+		"""The objects on screen at pts."""
+		entry = self.entry_at(pts)
+		return entry.objects if entry is not None else []
+
+	def between(self, start: int, end: int, include_empty: bool = False) -> list[PGSTimelineEntry]:
+		"""The display sets whose PTS is in [start, end)."""
+		entries = self.__resolver(range(bisect_left(self.__starts, start), bisect_left(self.__starts, end)))
+		return entries if include_empty else [e for e in entries if e.objects]
+
+	def overlapping(self, start: int, end: int, include_empty: bool = False) -> list[PGSTimelineEntry]:
+		"""The display sets that are on screen at any point in [start, end)."""
+		first = max(0, bisect_right(self.__starts, start) - 1)
+		last = bisect_left(self.__starts, end)
+		entries = self.__resolver(range(first, max(first, last)))
+		# the first one might end before the range starts when start is before the first display set
+		entries = [e for e in entries if e.end is None or e.end > start]
+		return entries if include_empty else [e for e in entries if e.objects]
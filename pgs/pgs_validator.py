@@ -0,0 +1,227 @@
+import io
+import os
+import mmap
+import pgs
+from .pgs_parser import (
+	PGS_MAGIC_VALUE, PGS_HEADER_LAYOUT, PGS_HEADER_LENGTH,
+	PCS_HEADER_LAYOUT, PCS_HEADER_LENGTH, PCS_OBJECT_LAYOUT, PCS_OBJECT_LENGTH, PCS_CROP_LENGTH,
+	WDS_HEADER_LENGTH, WDS_WINDOW_LENGTH, PDS_HEADER_LAYOUT, PDS_HEADER_LENGTH, PDS_PALETTE_LENGTH,
+	ODS_HEADER_LAYOUT, ODS_HEADER_LENGTH, ODS_PAYLOAD_HEADER_LAYOUT, ODS_PAYLOAD_HEADER_LENGTH,
+	PCSState, ODSPositionFlag, PCSSegment, WDSSegment, PDSSegment, ODSSegment, ENDSegment
+)
+
+MAX_EPOCH_PALETTES = 8
+MAX_EPOCH_OBJECTS = 64
+
+class PGSValidationFinding:
+	"""A structural problem found by validate_pgs."""
+	offset: int
+	"""Byte offset of the segment the problem was found in."""
+	message: str
+
+	def __init__(self, offset: int, message: str):
+		self.offset = offset
+		self.message = message
+
+	def __repr__(self) -> str:
+		return f'0x{self.offset:x}: {self.message}'
+
+class _DisplaySetState:
+	"""What validate_pgs tracks about the display set being read."""
+	def __init__(self, id: int, start: int):
+		self.id = id
+		self.start = start
+		self.pcs_count = 0
+		self.wds_count = 0
+
+def validate_pgs(source) -> list[PGSValidationFinding]:
+	"""Checks the structure of a path, bytes like object or binary stream in a single pass and returns every problem found, in stream order.
+	The rules are the ones PGSParser enforces (segment lengths, ODS fragments, the palette and object limits of epochs,
+	one PCS, WDS and END per display set) but nothing gets decoded: only the segment headers and the small PCS, WDS and PDS bodies are read,
+	ODS payloads are skipped by their length. Reading goes on after a problem as long as the next segment can be found,
+	a bad segment header or a truncated segment stops it since the segment boundaries are lost from there."""
+	if isinstance(source, (str, os.PathLike)):
+		with pgs.map_file(source) as mapped:
+			return validate_pgs(mapped)
+
+	if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+		reader = pgs.PGSBufferIO(source)
+	else:
+		reader = pgs.PGSStreamIO(source)
+
+	findings: list[PGSValidationFinding] = []
+	def report(offset: int, message: str):
+		findings.append(PGSValidationFinding(offset, message))
+
+	display_set: _DisplaySetState | None = None
+	display_set_count = 0
+	palettes: set[int] = set()
+	objects: set[int] = set()
+	# object id -> [offset of the first fragment, rle data still expected, fragment length]
+	fragments: dict[int, list[int]] = {}
+
+	def end_display_set(offset: int):
+		nonlocal display_set
+		if display_set.pcs_count != 1:
+			report(offset, f'bad number of PCS segments in display set #{display_set.id} ({display_set.pcs_count})')
+		if display_set.wds_count != 1:
+			report(offset, f'bad number of WDS segments in display set #{display_set.id} ({display_set.wds_count})')
+		for id, (fragment_start, remaining, _) in fragments.items():
+			report(fragment_start, f'ODS #{id} is missing {remaining} bytes of fragments at the end of display set #{display_set.id}')
+		fragments.clear()
+		display_set = None
+
+	with reader:
+		while reader.can_read():
+			segment_start = reader.tell()
+			if not reader.can_read(PGS_HEADER_LENGTH):
+				report(segment_start, 'truncated segment header')
+				break
+			(magic, _, _, segment_type, size) = reader.unpack(PGS_HEADER_LAYOUT)
+			if magic != PGS_MAGIC_VALUE:
+				report(segment_start, f'invalid packet header {bytes(magic)!r}, the rest of the stream can not be read')
+				break
+			if size > 0 and not reader.can_read(size):
+				report(segment_start, f'truncated segment, {size} bytes expected')
+				break
+			segment_end = segment_start + PGS_HEADER_LENGTH + size
+
+			if display_set is None:
+				display_set = _DisplaySetState(display_set_count, segment_start)
+				display_set_count += 1
+
+			if segment_type == PCSSegment.get_segment_id():
+				if display_set.pcs_count > 0:
+					report(segment_start, f'display set #{display_set.id} has no END segment before the next PCS')
+					end_display_set(segment_start)
+					display_set = _DisplaySetState(display_set_count, segment_start)
+					display_set_count += 1
+				display_set.pcs_count += 1
+				state = _check_pcs(reader, size, segment_start, report)
+				if state is not None and PCSState.EPOCH_START in state:
+					palettes.clear()
+					objects.clear()
+			elif segment_type == WDSSegment.get_segment_id():
+				display_set.wds_count += 1
+				if size < WDS_HEADER_LENGTH or (size - WDS_HEADER_LENGTH) % WDS_WINDOW_LENGTH != 0:
+					report(segment_start, f'invalid WDS segment length {size}')
+				else:
+					(window_count,) = reader.unpack('B')
+					if window_count * WDS_WINDOW_LENGTH + WDS_HEADER_LENGTH != size:
+						report(segment_start, f'WDS segment has {window_count} windows but a length of {size}')
+			elif segment_type == PDSSegment.get_segment_id():
+				if size < PDS_HEADER_LENGTH or (size - PDS_HEADER_LENGTH) % PDS_PALETTE_LENGTH != 0:
+					report(segment_start, f'invalid PDS segment length {size}')
+				else:
+					(id, _) = reader.unpack(PDS_HEADER_LAYOUT)
+					if id not in palettes:
+						palettes.add(id)
+						if len(palettes) == MAX_EPOCH_PALETTES + 1:
+							report(segment_start, f'PGS epochs have a limit of {MAX_EPOCH_PALETTES} palettes (PDS #{id})')
+			elif segment_type == ODSSegment.get_segment_id():
+				id = _check_ods(reader, size, segment_start, fragments, report)
+				if id is not None and id not in objects:
+					objects.add(id)
+					if len(objects) == MAX_EPOCH_OBJECTS + 1:
+						report(segment_start, f'PGS epochs have a limit of {MAX_EPOCH_OBJECTS} objects (ODS #{id})')
+			elif segment_type == ENDSegment.get_segment_id():
+				if size != 0:
+					report(segment_start, f'END segment has a length of {size} instead of 0')
+				end_display_set(segment_start)
+			else:
+				report(segment_start, f'unknown segment type 0x{segment_type:02x}')
+
+			# whatever wasn't looked at is skipped, which also keeps going after a bad segment body
+			if reader.tell() < segment_end:
+				reader.seek(segment_end)
+
+		if display_set is not None:
+			report(display_set.start, f'display set #{display_set.id} has no END segment, the final segment should always be an end segment')
+	return findings
+
+def _check_pcs(reader: pgs.PGSIO, size: int, segment_start: int, report) -> PCSState | None:
+	"""Returns the composition state when it's valid."""
+	if size < PCS_HEADER_LENGTH:
+		report(segment_start, f'PCS segment is too short ({size})')
+		return None
+	(_, _, _, _, state_flag, _, _, object_count) = reader.unpack(PCS_HEADER_LAYOUT)
+	state = None
+	try:
+		state = PCSState(state_flag)
+	except ValueError:
+		report(segment_start, f'unknown composition flag 0x{state_flag:02x}')
+	if object_count > 2:
+		report(segment_start, f'PCS are limited to 2 presentation objects at once ({object_count})')
+		return state
+
+	# the objects can have a crop or not, so their length is only known once they are read
+	length = PCS_HEADER_LENGTH
+	for _ in range(object_count):
+		if length + PCS_OBJECT_LENGTH > size:
+			break
+		is_cropped = reader.unpack(PCS_OBJECT_LAYOUT)[2]
+		length += PCS_OBJECT_LENGTH
+		if is_cropped == 0x40:
+			length += PCS_CROP_LENGTH
+			if length > size:
+				break
+			reader.seek(PCS_CROP_LENGTH, io.SEEK_CUR)
+	if length != size:
+		report(segment_start, f'PCS segment with {object_count} objects has a length of {size}')
+	return state
+
+def _check_ods(reader: pgs.PGSIO, size: int, segment_start: int, fragments: dict[int, list[int]], report) -> int | None:
+	"""Follows the same fragment rules as ODSSegment.read, returns the id of the object when the header could be read."""
+	if size < ODS_HEADER_LENGTH:
+		report(segment_start, f'ODS segment is too short ({size})')
+		return None
+	(id, _, flag) = reader.unpack(ODS_HEADER_LAYOUT)
+	if flag & ~int(ODSPositionFlag.FIRST_AND_LAST):
+		report(segment_start, f'ODS #{id} has an unknown sequence flag 0x{flag:02x}')
+	position_flag = ODSPositionFlag(flag & ODSPositionFlag.FIRST_AND_LAST)
+
+	if ODSPositionFlag.FIRST not in position_flag:
+		fragment = fragments.get(id)
+		if fragment is None:
+			report(segment_start, f'ODS fragment tried to append to an unknown or already complete object: {id}')
+			return id
+		fragment_length = size - ODS_HEADER_LENGTH
+		(_, remaining, expected_length) = fragment
+		if remaining < fragment_length:
+			report(segment_start, f"ODS fragment is longer ({fragment_length}) than the remaining amount of data expected to arrive for object #{id} ({remaining})")
+		elif fragment_length > expected_length:
+			report(segment_start, f'ODS fragment has a longer fragment length ({fragment_length}) than expected ({expected_length})')
+		elif fragment_length != expected_length and ODSPositionFlag.LAST not in position_flag:
+			report(segment_start, f'ODS fragment has a fragment length ({fragment_length}) that differs from the expected fragment length ({expected_length})')
+		fragment[1] = remaining - fragment_length
+		if ODSPositionFlag.LAST in position_flag:
+			if fragment[1] != 0:
+				report(segment_start, f'ODS fragment should have completed object #{id} but {fragment[1]} bytes are missing')
+			del fragments[id]
+		return id
+
+	if id in fragments:
+		report(segment_start, f'ODS #{id} is redefined before its last fragment was read')
+		del fragments[id]
+	if size < ODS_HEADER_LENGTH + ODS_PAYLOAD_HEADER_LENGTH:
+		report(segment_start, f'ODS segment is too short ({size}) to hold the object size')
+		return id
+	(length, width, height) = reader.unpack(ODS_PAYLOAD_HEADER_LAYOUT)
+	length = int.from_bytes(length, byteorder='big', signed=False)
+	if length < 7:
+		report(segment_start, f'ODS #{id} has a payload length that is too small ({length}), min should be 7 (w + h + 1 + eol) for an empty image with no pixels')
+		return id
+	if width == 0 or height == 0:
+		report(segment_start, f'ODS #{id} has a size of 0 pixels ({width} x {height})')
+
+	remaining = length - 4
+	fragment_length = size - (ODS_HEADER_LENGTH + ODS_PAYLOAD_HEADER_LENGTH)
+	if remaining < fragment_length:
+		report(segment_start, f'ODS #{id} has a rle length ({remaining}) smaller than its segment holds ({fragment_length})')
+	elif ODSPositionFlag.LAST in position_flag:
+		if remaining != fragment_length:
+			report(segment_start, f"ODS #{id} is first and last but its rle length ({remaining}) is greater than the segment holds ({fragment_length})")
+	else:
+		# the next fragments can use the space of the payload header
+		fragments[id] = [segment_start, remaining - fragment_length, size - ODS_HEADER_LENGTH]
+	return id
@@ -0,0 +1,95 @@
+import argparse
+import json
+import sys
+from benchmarks import BENCHMARK_STAGES, make_pgs_file, run_stage, measure_memory
+from benchmarks.stages import BenchmarkData
+
+COMPARED_METRICS = {
+	# metric: True if higher is better
+	'seconds': False,
+	'peak_memory': False,
+}
+
+def run(args) -> int:
+	config = {
+		'display_sets': args.display_sets,
+		'width': args.width,
+		'height': args.height,
+		'objects': args.objects,
+		'run_length': args.run_length,
+		'colors': args.colors,
+		'repeat': args.repeat,
+	}
+	data = BenchmarkData(make_pgs_file(args.display_sets, args.width, args.height, args.objects, args.run_length, args.colors))
+	print(f'synthetic stream: {len(data.data) / 1_000_000:.2f} MB, {data.segments} segments, {len(data.objects)} objects')
+
+	results = {}
+	print(f'{"stage":<12} {"seconds":>10} {"MB/s":>10} {"segments/s":>12} {"objects/s":>10} {"peak MB":>10}')
+	for stage in args.stages or BENCHMARK_STAGES.keys():
+		result = run_stage(stage, data, args.repeat)
+		results[stage] = result.to_dict()
+		print(f'{stage:<12} {result.seconds:>10.4f} {result.mb_per_s:>10.2f} {result.segments_per_s:>12.1f} {result.objects_per_s:>10.1f} {result.peak_memory / 1_000_000:>10.2f}')
+
+	memory = measure_memory(data)
+	print(f'parsed file: {memory.bytes_per_display_set:.0f} bytes per display set, {memory.overhead_per_display_set:.0f} of which are not rle data')
+
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump({'config': config, 'results': results, 'memory': memory.to_dict()}, f, indent='\t')
+	return 0
+
+def compare(args) -> int:
+	with open(args.baseline) as f:
+		baseline = json.load(f)
+	with open(args.candidate) as f:
+		candidate = json.load(f)
+
+	if baseline['config'] != candidate['config']:
+		print('warning: the results were made with different configurations', file=sys.stderr)
+
+	regressions = 0
+	print(f'{"stage":<12} {"metric":<12} {"baseline":>12} {"candidate":>12} {"change":>9}')
+	for stage, base_result in baseline['results'].items():
+		if stage not in candidate['results']:
+			continue
+		for metric, higher_is_better in COMPARED_METRICS.items():
+			(old, new) = (base_result[metric], candidate['results'][stage][metric])
+			change = (new - old) / old * 100 if old else 0.0
+			regressed = (change < -args.threshold) if higher_is_better else (change > args.threshold)
+			regressions += regressed
+			print(f'{stage:<12} {metric:<12} {old:>12.4g} {new:>12.4g} {change:>+8.1f}%{" REGRESSION" if regressed else ""}')
+
+	if 'memory' in baseline and 'memory' in candidate:
+		(old, new) = (baseline['memory']['overhead_per_display_set'], candidate['memory']['overhead_per_display_set'])
+		change = (new - old) / old * 100 if old else 0.0
+		regressed = change > args.threshold
+		regressions += regressed
+		print(f'{"memory":<12} {"overhead/ds":<12} {old:>12.4g} {new:>12.4g} {change:>+8.1f}%{" REGRESSION" if regressed else ""}')
+
+	# non zero exit code so it can be used as a gate
+	return 1 if regressions else 0
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmarks the parser, the rle codec and the export paths on a synthetic PGS stream.')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	run_parser = subparsers.add_parser('run', help='Run the benchmarks.')
+	run_parser.add_argument('--display-sets', default=100, type=int, help='Amount of display sets in the stream.')
+	run_parser.add_argument('--width', default=1920, type=int, help='Width of the objects.')
+	run_parser.add_argument('--height', default=150, type=int, help='Height of the objects.')
+	run_parser.add_argument('--objects', default=1, type=int, choices=(1, 2), help='Objects per display set.')
+	run_parser.add_argument('--run-length', default=8, type=int, help='Average run length in pixels, shorter runs mean more rle data and more ODS fragments.')
+	run_parser.add_argument('--colors', default=16, type=int, help='Amount of palette entries used by the objects.')
+	run_parser.add_argument('--repeat', default=3, type=int, help='Amount of timed runs, the best one is kept.')
+	run_parser.add_argument('--stages', nargs='*', choices=BENCHMARK_STAGES.keys(), help='Stages to run, all of them by default.')
+	run_parser.add_argument('--output', '-o', default=None, help='Where to save the results as json.')
+	run_parser.set_defaults(func=run)
+
+	compare_parser = subparsers.add_parser('compare', help='Compare two saved result files.')
+	compare_parser.add_argument('baseline', help='The reference results.')
+	compare_parser.add_argument('candidate', help='The new results.')
+	compare_parser.add_argument('--threshold', default=5.0, type=float, help='Change in percent after which a metric is considered a regression.')
+	compare_parser.set_defaults(func=compare)
+
+	args = parser.parse_args()
+	sys.exit(args.func(args))
@@ -1,3 +1,12 @@
 from .test_rle import TestRLE
 from .test_parser import TestParser
-from .test_image_utils import TestImageUtils
\ No newline at end of file
+from .test_image_utils import TestImageUtils
+from .test_io import TestIO
+from .test_cache import TestCache
+from .test_index import TestIndex
+from .test_timeline import TestTimeline
+from .test_compositor import TestCompositor
+from .test_diff import TestDiff
+from .test_object_store import TestObjectStore
+from .test_pipeline import TestPipeline
+from .test_validator import TestValidator
@@ -0,0 +1,87 @@
+"""Segment and stream builders shared by the test modules."""
+import io
+from pgs import *
+
+
+class ChunkedStream(io.RawIOBase):
+	"""Behaves like a pipe that only returns a few bytes per read."""
+
+	def __init__(self, data: bytes, chunk_size: int = 3):
+		self.data = data
+		self.chunk_size = chunk_size
+
+	def readable(self) -> bool:
+		return True
+
+	def read(self, size: int = -1) -> bytes:
+		size = self.chunk_size if size < 0 else min(size, self.chunk_size)
+		(ret, self.data) = (self.data[:size], self.data[size:])
+		return ret
+
+def make_test_file() -> PGSFile:
+	"""epoch start with an object at 100, clear at 200, same object shown again at 300 without being resent, new epoch at 400"""
+	rle_data = encode_pgs_rle([b'\x01' * 4] * 2)
+	palette = [PDSPalette(1, 255, 128, 128, 255)]
+	segments = [
+		PCSSegment(100, 100, 1920, 1080, 0x10, 0, PCSState.EPOCH_START, False, 0, [PCSObject(0, 0, 10, 20)]),
+		WDSSegment(100, 100, [WDSWindow(0, 10, 20, 4, 2)]),
+		PDSSegment(100, 100, 0, 0, palette),
+		ODSSegment(100, 100, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 4, 2, rle_data),
+		ENDSegment(100, 100),
+		PCSSegment(200, 200, 1920, 1080, 0x10, 1, PCSState.NORMAL, False, 0, []),
+		WDSSegment(200, 200, [WDSWindow(0, 10, 20, 4, 2)]),
+		ENDSegment(200, 200),
+		PCSSegment(300, 300, 1920, 1080, 0x10, 2, PCSState.NORMAL, False, 0, [PCSObject(0, 0, 10, 20)]),
+		WDSSegment(300, 300, [WDSWindow(0, 10, 20, 4, 2)]),
+		ENDSegment(300, 300),
+		PCSSegment(400, 400, 1920, 1080, 0x10, 3, PCSState.EPOCH_START, False, 0, []),
+		WDSSegment(400, 400, []),
+		ENDSegment(400, 400),
+	]
+	return PGSFile(segments)
+
+def make_repeating_file(repeats: int) -> bytes:
+	"""the same object sent again at every epoch start, alternating between 2 ids"""
+	rle_data = encode_pgs_rle([b'\x01' * 4] * 2)
+	segments = []
+	for i in range(repeats):
+		pts = i * 100
+		segments += [
+			PCSSegment(pts, pts, 64, 32, 0x10, i, PCSState.EPOCH_START, False, 0, [PCSObject(0, i % 2, 0, 0)]),
+			WDSSegment(pts, pts, [WDSWindow(0, 0, 0, 4, 2)]),
+			PDSSegment(pts, pts, 0, 0, [PDSPalette(1, 255, 128, 128, 255)]),
+			ODSSegment(pts, pts, i % 2, 0, ODSPositionFlag.FIRST_AND_LAST, 4, 2, rle_data),
+			ENDSegment(pts, pts),
+		]
+	return PGSFile(segments).write()
+
+def write_segments(segments: list[PGSSegment]) -> tuple[bytes, list[int]]:
+	"""serializes segments without any display set checks, returns the data and the offset of every segment"""
+	stream = io.BytesIO()
+	writer = PGSStreamIO(stream)
+	offsets = []
+	for segment in segments:
+		offsets.append(writer.tell())
+		segment.serialize(writer)
+	return (stream.getvalue(), offsets)
+
+def make_simple_display_set(pts: int, state: PCSState = PCSState.EPOCH_START, extra: list[PGSSegment] = []) -> list[PGSSegment]:
+	"""one 4x2 object shown in a single window, the extra segments go before the END segment"""
+	rle_data = encode_pgs_rle([b'\x01' * 4] * 2)
+	return [
+		PCSSegment(pts, pts, 64, 32, 0x10, 0, state, False, 0, [PCSObject(0, 0, 0, 0)]),
+		WDSSegment(pts, pts, [WDSWindow(0, 0, 0, 4, 2)]),
+		PDSSegment(pts, pts, 0, 0, [PDSPalette(1, 255, 128, 128, 255)]),
+		ODSSegment(pts, pts, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 4, 2, rle_data),
+		*extra,
+		ENDSegment(pts, pts),
+	]
+
+def make_composed_display_set(pts: int, state: PCSState, objects: list[PCSObject], windows: list[WDSWindow], *segments: PGSSegment) -> list[PGSSegment]:
+	"""the given composition and windows followed by the segments and an END segment"""
+	return [
+		PCSSegment(pts, pts, 64, 32, 0x10, 0, state, False, 0, objects),
+		WDSSegment(pts, pts, windows),
+		*segments,
+		ENDSegment(pts, pts),
+	]
@@ -0,0 +1,53 @@
+import unittest
+from pgs import PGSImageCache, ODSSegment, ODSPositionFlag, PDSSegment, PDSPalette, encode_pgs_rle
+import numpy as np
+
+
+class TestCache(unittest.TestCase):
+
+
+	def make_ods(self, id: int, color: int, width: int = 4, height: int = 2) -> ODSSegment:
+		rle_data = encode_pgs_rle([bytes([color]) * width] * height)
+		return ODSSegment(0, 0, id, 0, ODSPositionFlag.FIRST_AND_LAST, width, height, rle_data)
+
+	def test_bitmap_hit(self):
+		cache = PGSImageCache()
+		ods = self.make_ods(0, 5)
+		first = cache.get_indexes(ods)
+		second = cache.get_indexes(ods)
+		self.assertIs(first, second)
+		self.assertEqual((1, 1), (cache.hits, cache.misses))
+		self.assertTrue(np.all(first == 5))
+		self.assertFalse(first.flags.writeable)
+
+	def test_bitmap_changed_data(self):
+		cache = PGSImageCache()
+		ods = self.make_ods(0, 5)
+		cache.get_indexes(ods)
+		ods.rle_data = self.make_ods(0, 6).rle_data
+		self.assertTrue(np.all(cache.get_indexes(ods) == 6))
+		self.assertEqual((0, 2), (cache.hits, cache.misses))
+
+	def test_bitmap_lru_limit(self):
+		cache = PGSImageCache(max_bytes=16)
+		first = self.make_ods(0, 1)
+		second = self.make_ods(1, 2)
+		third = self.make_ods(2, 3)
+		cache.get_indexes(first)
+		cache.get_indexes(second)
+		cache.get_indexes(first)
+		cache.get_indexes(third)
+		self.assertEqual(16, cache.size)
+		cache.get_indexes(first)
+		cache.get_indexes(second)
+		self.assertEqual((2, 4), (cache.hits, cache.misses))
+
+	def test_palette_hit(self):
+		cache = PGSImageCache()
+		pds = PDSSegment(0, 0, 0, 0, [PDSPalette(1, 255, 128, 128, 255)])
+		palette = cache.get_palette(pds)
+		self.assertIs(palette, cache.get_palette(pds))
+		self.assertEqual((1, 1), (cache.palette_hits, cache.palette_misses))
+		self.assertEqual((255, 255, 255, 255), tuple(palette[1]))
+		# same id and version in a new epoch is a different palette
+		self.assertIsNot(palette, cache.get_palette(PDSSegment(0, 0, 0, 0, [PDSPalette(1, 16, 128, 128, 255)])))
@@ -0,0 +1,131 @@
+import unittest
+import numpy as np
+from io import BytesIO
+from fractions import Fraction
+from pgs import *
+from tests.helpers import make_test_file, make_composed_display_set
+
+
+class TestCompositor(unittest.TestCase):
+
+
+	def test_render(self):
+		compositor = PGSCompositor()
+		frames = [compositor.render(ds).copy() for ds in make_test_file().display_sets]
+		self.assertEqual((1080, 1920, 4), frames[0].shape)
+
+		# the object is opaque white at its position and nothing else is drawn
+		self.assertTrue((frames[0][20:22, 10:14] == 255).all())
+		self.assertEqual(4 * 2 * 4 * 255, int(frames[0].sum(dtype=np.int64)))
+		self.assertFalse(frames[1].any())
+		self.assertTrue(np.array_equal(frames[0], frames[2]))
+		self.assertFalse(frames[3].any())
+
+	def test_crop_and_window(self):
+		# 8x4 object, left half index 1 and right half index 2
+		rle_data = encode_pgs_rle([b'\x01' * 4 + b'\x02' * 4] * 4)
+		palette = [PDSPalette(1, 255, 128, 128, 255), PDSPalette(2, 0, 128, 128, 128)]
+		pds = PDSSegment(0, 0, 0, 0, palette)
+		ods = ODSSegment(0, 0, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 8, 4, rle_data)
+		window = WDSWindow(0, 10, 10, 20, 2)
+
+		# crop the right half of the object, the window only shows its 2 first lines
+		crop = PCSObjectCrop(4, 0, 4, 4)
+		ds = PGSFile(make_composed_display_set(0, PCSState.EPOCH_START, [PCSObject(0, 0, 10, 10, crop)], [window], pds, ods)).display_sets[0]
+		canvas = PGSCompositor().render(ds)
+		self.assertTrue((canvas[10:12, 10:14] == [0, 0, 0, 128]).all())
+		canvas[10:12, 10:14] = 0
+		self.assertFalse(canvas.any())
+
+	def test_dirty_windows(self):
+		rle_data = encode_pgs_rle([b'\x01' * 4] * 4)
+		pds = PDSSegment(0, 0, 0, 0, [PDSPalette(1, 255, 128, 128, 255)])
+		ods = ODSSegment(0, 0, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 4, 4, rle_data)
+		windows = [WDSWindow(0, 0, 0, 8, 8), WDSWindow(1, 20, 20, 8, 8)]
+		both = [PCSObject(0, 0, 0, 0), PCSObject(1, 0, 20, 20)]
+		file = PGSFile([
+			*make_composed_display_set(0, PCSState.EPOCH_START, both, windows, pds, ods),
+			*make_composed_display_set(1, PCSState.NORMAL, both, windows),
+			*make_composed_display_set(2, PCSState.NORMAL, [PCSObject(0, 0, 0, 0), PCSObject(1, 0, 22, 22)], windows),
+			*make_composed_display_set(3, PCSState.NORMAL, [PCSObject(0, 0, 0, 0)], windows),
+		])
+		compositor = PGSCompositor()
+		compositor.render(file.display_sets[0])
+		self.assertEqual([(0, 0, 8, 8), (20, 20, 8, 8)], sorted(compositor.dirty_rects))
+
+		# nothing changed
+		compositor.render(file.display_sets[1])
+		self.assertEqual([], compositor.dirty_rects)
+
+		# only the second window moved its object
+		canvas = compositor.render(file.display_sets[2])
+		self.assertEqual([(20, 20, 8, 8)], compositor.dirty_rects)
+		self.assertTrue((canvas[22:26, 22:26] == 255).all())
+		self.assertFalse(canvas[20:22, 20:28].any())
+		self.assertTrue((canvas[0:4, 0:4] == 255).all())
+
+		canvas = compositor.render(file.display_sets[3])
+		self.assertEqual([(20, 20, 8, 8)], compositor.dirty_rects)
+		self.assertFalse(canvas[20:28, 20:28].any())
+		self.assertTrue((canvas[0:4, 0:4] == 255).all())
+
+	def test_palette_only_update(self):
+		rle_data = encode_pgs_rle([b'\x01' * 4 + b'\x02' * 4] * 4)
+		ods = ODSSegment(0, 0, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 8, 4, rle_data)
+		windows = [WDSWindow(0, 0, 0, 16, 16)]
+		objects = [PCSObject(0, 0, 2, 2)]
+		segments = make_composed_display_set(0, PCSState.EPOCH_START, objects, windows, PDSSegment(0, 0, 0, 0, [PDSPalette(1, 255, 128, 128, 255), PDSPalette(2, 0, 128, 128, 255)]), ods)
+		for alpha in (192, 128, 64):
+			fade = PDSSegment(alpha, alpha, 0, alpha, [PDSPalette(1, 255, 128, 128, alpha), PDSPalette(2, 0, 128, 128, alpha)])
+			update = make_composed_display_set(alpha, PCSState.NORMAL, objects, windows, fade)
+			update[0].is_palette_only_update = True
+			segments += update
+		file = PGSFile(segments)
+
+		compositor = PGSCompositor()
+		compositor.render(file.display_sets[0])
+		for ds in file.display_sets[1:]:
+			canvas = compositor.render(ds)
+			self.assertTrue(compositor.palette_only)
+			self.assertEqual([(0, 0, 16, 16)], compositor.dirty_rects)
+
+			# same as drawing everything again
+			expected = PGSCompositor()
+			for previous in file.display_sets[:ds.id + 1]:
+				expected.render(previous)
+			self.assertTrue(np.array_equal(expected.canvas, canvas))
+			self.assertTrue((canvas[2:6, 2:6] == [255, 255, 255, ds.pcs.pts]).all())
+
+		# palette only display sets survive a write
+		self.assertTrue(PGSParser.read_from_bytes(file.write()).display_sets[1].pcs.is_palette_only_update)
+
+	def test_blended_objects_fall_back(self):
+		rle_data = encode_pgs_rle([b'\x01' * 4] * 4)
+		ods = [ODSSegment(0, 0, i, 0, ODSPositionFlag.FIRST_AND_LAST, 4, 4, rle_data) for i in range(2)]
+		windows = [WDSWindow(0, 0, 0, 16, 16)]
+		objects = [PCSObject(0, 0, 0, 0), PCSObject(0, 1, 2, 2)]
+		file = PGSFile([
+			*make_composed_display_set(0, PCSState.EPOCH_START, objects, windows, PDSSegment(0, 0, 0, 0, [PDSPalette(1, 255, 128, 128, 128)]), *ods),
+			*make_composed_display_set(1, PCSState.NORMAL, objects, windows, PDSSegment(1, 1, 0, 1, [PDSPalette(1, 255, 128, 128, 64)])),
+		])
+		compositor = PGSCompositor()
+		compositor.render(file.display_sets[0])
+		self.assertEqual(192, compositor.canvas[3, 3, 3])
+		canvas = compositor.render(file.display_sets[1])
+		self.assertFalse(compositor.palette_only)
+		self.assertEqual(112, canvas[3, 3, 3])
+		self.assertEqual(64, canvas[0, 0, 3])
+
+	def test_write_rgba_frames(self):
+		# display sets at 100, 200, 300 and 400 ticks, a frame every 90 ticks
+		file = make_test_file()
+		out = BytesIO()
+		frame_count = write_rgba_frames(file.display_sets, out, Fraction(1000))
+		self.assertEqual(6, frame_count)
+		frames = np.frombuffer(out.getvalue(), dtype=np.uint8).reshape(frame_count, 1080, 1920, 4)
+		# frames 0 and 1 are before the first display set, then every frame shows what the last display set before it left on screen
+		self.assertEqual([False, False, True, False, True, False], [bool(frame.any()) for frame in frames])
+
+		out = BytesIO()
+		self.assertEqual(3, write_rgba_frames(iter(file.display_sets), out, Fraction(1000), end_pts=250))
+		self.assertEqual(3 * 1080 * 1920 * 4, len(out.getvalue()))
@@ -0,0 +1,57 @@
+import unittest
+from pathlib import Path
+from pgs import *
+from tests.helpers import make_test_file
+
+
+class TestDiff(unittest.TestCase):
+
+
+	def test_identical(self):
+		path = Path(__file__).parent / 'simple.sup'
+		parsed = PGSParser.read_from_file(path)
+		diff = diff_pgs(parsed, path)
+		self.assertFalse(diff)
+		self.assertEqual(len(parsed.display_sets), diff.matched)
+
+	def test_reencoded_object(self):
+		# same pixels with a different encoding, runs of 1 pixel instead of a single run
+		old = make_test_file()
+		new = make_test_file()
+		ods = new.display_sets[0].ods[0]
+		ods.rle_data = b'\x01\x01\x01\x01\x00\x00' * 2
+		diff = diff_pgs(old, new)
+		self.assertEqual(1, len(diff.changed))
+		self.assertEqual([], diff.changed[0].fields)
+		self.assertEqual(0, diff.changed[0].objects[0].changed_pixels)
+		self.assertIsNone(diff.changed[0].objects[0].bounding_box)
+
+		# without pixel comparison
+		self.assertIsNone(diff_pgs(old, new, compare_pixels=False).changed[0].objects[0].changed_pixels)
+
+	def test_changes(self):
+		old = make_test_file()
+		new = make_test_file()
+		ds = new.display_sets[0]
+		ds.pcs.objects[0].x = 12
+		ds.wds.windows[0].width = 5
+		ds.pds[0].palette_array = PDSSegment(0, 0, 0, 0, [PDSPalette(1, 255, 128, 128, 128)]).palette_array
+		ds.ods[0].rle_data = encode_pgs_rle([b'\x01\x02\x01\x01'] * 2)
+		# the clear at 200 moves to 250
+		new.display_sets[1].pcs.pts = 250
+
+		diff = diff_pgs(old, new)
+		self.assertEqual(3, diff.matched)
+		self.assertEqual([200], [d.pts for d in diff.removed])
+		self.assertEqual([250], [d.pts for d in diff.added])
+
+		changed = diff.changed[0]
+		self.assertEqual(100, changed.pts)
+		self.assertEqual(
+			[('pcs', None, 'objects'), ('wds', 0, 'window'), ('pds', 0, 'palettes')],
+			[(f.segment, f.id, f.field) for f in changed.fields]
+		)
+		self.assertEqual({1: [255, 128, 128, 255]}, changed.fields[2].old)
+		self.assertEqual({1: [255, 128, 128, 128]}, changed.fields[2].new)
+		self.assertEqual(2, changed.objects[0].changed_pixels)
+		self.assertEqual((1, 0, 1, 2), changed.objects[0].bounding_box)
@@ -1,5 +1,5 @@
 import unittest
-from pgs import ycbcr_to_rgb, rgb_to_ycbcr
+from pgs import ycbcr_to_rgb, rgb_to_ycbcr, ycbcr_to_rgb_array, rgb_to_ycbcr_array, rgba_to_pds_palette_array, PGSColorMatrix, PDSSegment, segment_to_pil, quantize_rgba, pil_color_to_pds_palette, PGSParserException
 import numpy as np
 
 class TestImageUtils(unittest.TestCase):
@@ -15,4 +15,84 @@ class TestImageUtils(unittest.TestCase):
 		for r in range(256):
 			for g in range(256):
 				for b in range(256):
-					np.array([rgb_to_ycbcr(r, g, b)], dtype=np.uint8)
\ No newline at end of file
+					np.array([rgb_to_ycbcr(r, g, b)], dtype=np.uint8)
+
+	def test_ycbcr_to_rgb_array_matches_scalar(self):
+		values = np.random.default_rng(0).integers(0, 256, (4096, 3), dtype=np.uint8)
+		expected = np.array([ycbcr_to_rgb(*value) for value in values.tolist()], dtype=np.uint8)
+		self.assertTrue(np.array_equal(ycbcr_to_rgb_array(values), expected))
+		self.assertLessEqual(np.abs(ycbcr_to_rgb_array(values, use_lut=True).astype(int) - expected).max(), 1)
+
+	def test_rgb_to_ycbcr_array_matches_scalar(self):
+		values = np.random.default_rng(0).integers(0, 256, (4096, 3), dtype=np.uint8)
+		expected = np.array([rgb_to_ycbcr(*value) for value in values.tolist()], dtype=np.uint8)
+		self.assertTrue(np.array_equal(rgb_to_ycbcr_array(values), expected))
+		self.assertLessEqual(np.abs(rgb_to_ycbcr_array(values, use_lut=True).astype(int) - expected).max(), 1)
+
+	def test_limited_range(self):
+		for matrix in PGSColorMatrix:
+			for use_lut in (False, True):
+				rgb = ycbcr_to_rgb_array(np.array([[235, 128, 128, 7], [16, 128, 128, 9]]), matrix, False, use_lut)
+				self.assertEqual(rgb.tolist(), [[255, 255, 255, 7], [0, 0, 0, 9]])
+				ycbcr = rgb_to_ycbcr_array(np.array([[255, 255, 255], [0, 0, 0]]), matrix, False, use_lut)
+				# truncation like rgb_to_ycbcr, so white can land on 234
+				self.assertAlmostEqual(int(ycbcr[0,0]), 235, delta=1)
+				self.assertEqual(int(ycbcr[1,0]), 16)
+
+	def test_bt709_roundtrip(self):
+		rgb = np.random.default_rng(1).integers(0, 256, (1024, 3), dtype=np.uint8)
+		back = ycbcr_to_rgb_array(rgb_to_ycbcr_array(rgb, PGSColorMatrix.BT709), PGSColorMatrix.BT709)
+		self.assertLessEqual(np.abs(back.astype(int) - rgb).max(), 3)
+
+	def test_rgba_to_pds_palette_array(self):
+		rgba = np.array([[0, 0, 0, 0], [255, 0, 0, 255], [0, 0, 255, 128]], dtype=np.uint8)
+		pds = PDSSegment(0, 0, 0, 0, rgba_to_pds_palette_array(rgba))
+		self.assertEqual([palette.id for palette in pds.palettes], [0, 1, 2])
+		# red has a high CR, blue a high CB
+		self.assertGreater(pds.palettes[1].cr, pds.palettes[1].cb)
+		self.assertGreater(pds.palettes[2].cb, pds.palettes[2].cr)
+		self.assertLessEqual(np.abs(segment_to_pil(pds)[:3].astype(int) - rgba).max(), 3)
+
+	def test_quantize_rgba(self):
+		rng = np.random.default_rng(2)
+		colors = np.array([[0, 0, 0, 0], [255, 0, 0, 255], [0, 255, 0, 128], [255, 255, 255, 0], [9, 9, 9, 9]], dtype=np.uint8)
+		images = [colors[rng.integers(0, 4, (6, 5))], colors[rng.integers(1, 5, (3, 7))]]
+		(indexes, palettes) = quantize_rgba(images)
+		self.assertEqual([(6, 5), (3, 7)], [i.shape for i in indexes])
+		self.assertEqual(np.uint8, indexes[0].dtype)
+
+		# invisible white merges with transparency, which comes first
+		self.assertEqual(4, len(palettes))
+		self.assertEqual([0, 1, 2, 3], [p.id for p in palettes])
+		self.assertEqual((0, 0), (palettes[0].id, palettes[0].alpha))
+
+		# every pixel maps back to its color
+		rgba = {p.id: p for p in palettes}
+		for image, image_indexes in zip(images, indexes):
+			for color, index in zip(image.reshape(-1, 4).tolist(), image_indexes.reshape(-1).tolist()):
+				expected = pil_color_to_pds_palette(color if color[3] else [0, 0, 0, 0], index)
+				self.assertEqual((expected.lum, expected.cr, expected.cb, expected.alpha), (rgba[index].lum, rgba[index].cr, rgba[index].cb, rgba[index].alpha))
+
+	def test_quantize_rgba_limit(self):
+		image = np.zeros((1, 300, 4), dtype=np.uint8)
+		image[0, :, 0] = np.arange(300) % 256
+		image[0, :, 1] = np.arange(300) // 256
+		image[0, :, 3] = 255
+		with self.assertRaises(PGSParserException):
+			quantize_rgba([image])
+
+		(indexes, palettes) = quantize_rgba([image], max_colors=16, reduce=True)
+		self.assertEqual(16, len(palettes))
+		self.assertLess(int(indexes[0].max()), 16)
+
+		# rare colors go to the closest common one
+		image = np.zeros((2, 100, 4), dtype=np.uint8)
+		image[0] = [250, 0, 0, 255]
+		image[1] = [0, 0, 250, 255]
+		image[0, :5, 0] += np.arange(5, dtype=np.uint8)
+		image[1, :5, 2] += np.arange(5, dtype=np.uint8)
+		(indexes, palettes) = quantize_rgba([image], max_colors=3, reduce=True)
+		self.assertEqual(3, len(palettes))
+		self.assertEqual(1, len(np.unique(indexes[0][0])))
+		self.assertEqual(1, len(np.unique(indexes[0][1])))
+		self.assertNotEqual(indexes[0][0, 0], indexes[0][1, 0])
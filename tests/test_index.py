@@ -0,0 +1,41 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+from pgs import PGSIndex, PGSParser, PCSState
+
+
+class TestIndex(unittest.TestCase):
+
+
+	def setUp(self):
+		self.path = Path(__file__).parent / 'simple.sup'
+		self.parsed = PGSParser.read_from_file(self.path)
+
+	def test_build(self):
+		index = PGSIndex.build(self.path)
+		self.assertEqual(len(self.parsed.display_sets), len(index))
+		self.assertEqual([ds.pcs.pts for ds in self.parsed.display_sets], index.entries['pts'].tolist())
+		self.assertEqual([int(ds.pcs.state) for ds in self.parsed.display_sets], index.entries['state'].tolist())
+		self.assertEqual(0, int(index.entries['start'][0]))
+		self.assertEqual(os.path.getsize(self.path), int(index.entries['end'][-1]))
+		# every display set that isn't a normal update can be decoded on it's own
+		for entry in index.entries:
+			if entry['state'] != PCSState.NORMAL:
+				self.assertEqual(entry['start'], entry['decode_start'])
+
+	def test_save_load(self):
+		index = PGSIndex.build(self.path)
+		with tempfile.TemporaryDirectory() as temp_dir:
+			index.save(os.path.join(temp_dir, 'index.npy'))
+			loaded = PGSIndex.load(os.path.join(temp_dir, 'index.npy'))
+			self.assertTrue((index.entries == loaded.entries).all())
+			del loaded
+
+	def test_read_range(self):
+		index = PGSIndex.build(self.path)
+		last = self.parsed.display_sets[-1]
+		display_sets = index.read_range(self.path, last.pcs.pts, last.pcs.pts)
+		self.assertEqual([last.id], [ds.id for ds in display_sets])
+		self.assertEqual(last.pcs.number, display_sets[0].pcs.number)
+		self.assertEqual([], index.read_range(self.path, 0, -1))
@@ -0,0 +1,88 @@
+import unittest
+import io
+import os
+import tempfile
+from pgs import PGSBufferIO, PGSStreamIO, PGSIOException, PGSParserException, map_file
+from tests.helpers import ChunkedStream
+
+
+class TestIO(unittest.TestCase):
+
+
+	def test_buffer_unpack(self):
+		with PGSBufferIO(b'PG\x00\x00\x00\x01\x00\x00\x00\x02\x80\x00\x00') as reader:
+			self.assertEqual((b'PG', 1, 2, 0x80, 0), reader.unpack('2sIIBH'))
+			self.assertFalse(reader.can_read())
+
+	def test_buffer_read_does_not_copy(self):
+		data = bytearray(b'\x00\x01\x02\x03')
+		with PGSBufferIO(data) as reader:
+			reader.seek(1)
+			read = reader.read(2)
+			data[1] = 0xff
+			self.assertEqual(b'\xff\x02', bytes(read))
+			self.assertEqual(3, reader.tell())
+			read.release()
+
+	def test_buffer_read_past_end(self):
+		with PGSBufferIO(b'\x00\x01') as reader:
+			self.assertRaises(PGSIOException, reader.read, 3)
+			self.assertRaises(PGSIOException, reader.unpack, 'I')
+
+	def test_buffer_is_readonly(self):
+		with PGSBufferIO(b'\x00\x01') as reader:
+			self.assertRaises(PGSIOException, reader.write, b'\x00')
+
+	def test_buffer_find(self):
+		for data in (b'xxPGxxPG', bytearray(b'xxPGxxPG'), memoryview(b'xxPGxxPG')):
+			with PGSBufferIO(data) as reader:
+				reader.seek(3)
+				self.assertEqual(6, reader.find(b'PG'))
+				self.assertEqual(2, reader.find(b'PG', 0))
+				self.assertEqual(-1, reader.find(b'PG', 7))
+				self.assertEqual(3, reader.tell())
+
+	def test_stream_read_chunked(self):
+		with PGSStreamIO(ChunkedStream(b'PG\x00\x00\x00\x01\x00\x00\x00\x02\x80\x00\x00\x05')) as reader:
+			self.assertEqual((b'PG', 1, 2, 0x80, 0), reader.unpack('2sIIBH'))
+			self.assertEqual(13, reader.tell())
+			self.assertTrue(reader.can_read())
+			self.assertFalse(reader.can_read(2))
+			self.assertEqual(b'\x05', reader.read(1))
+			self.assertFalse(reader.can_read())
+
+	def test_stream_seek_forward(self):
+		with PGSStreamIO(ChunkedStream(bytes(range(10)))) as reader:
+			reader.seek(4, io.SEEK_CUR)
+			self.assertEqual(b'\x04', reader.read(1))
+			self.assertRaises(PGSIOException, reader.seek, 0)
+
+	def test_stream_write(self):
+		out = io.BytesIO()
+		with PGSStreamIO(out) as writer:
+			writer.pack('BH', 1, 2)
+			writer.write(b'\x03')
+			self.assertEqual(4, writer.tell())
+		self.assertEqual(b'\x01\x00\x02\x03', out.getvalue())
+
+	def test_map_file_closes_on_error(self):
+		def parse(mapped):
+			# a view left in the frame of the failed call
+			fragment = PGSBufferIO(mapped).read(2)
+			raise PGSParserException('bad segment')
+
+		with tempfile.TemporaryDirectory() as dir:
+			path = os.path.join(dir, 'test.sup')
+			with open(path, 'wb') as f:
+				f.write(b'PG\x00\x00')
+			with self.assertRaises(PGSParserException):
+				with map_file(path) as mapped:
+					parse(mapped)
+			self.assertTrue(mapped.closed)
+
+			# a view kept past the context is an error
+			with self.assertRaises(PGSIOException):
+				with map_file(path) as mapped:
+					view = memoryview(mapped)
+			view.release()
+			mapped.close()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from pgs import *
+from tests.helpers import make_repeating_file
+
+
+class TestObjectStore(unittest.TestCase):
+
+
+	def test_intern_on_read(self):
+		data = make_repeating_file(4)
+		store = PGSObjectStore()
+		parsed = PGSParser.read_from_bytes(data, store)
+		objects = [ds.ods[ds.pcs.objects[0].object_id] for ds in parsed.display_sets]
+		self.assertTrue(all(ods.rle_data is objects[0].rle_data for ods in objects))
+		self.assertEqual(1, len(store))
+		self.assertEqual(4.0, store.dedup_ratio)
+		self.assertEqual(store.total_bytes // 4, store.unique_bytes)
+		self.assertEqual(data, parsed.write())
+
+		# streaming works the same
+		streamed = PGSObjectStore()
+		buffers = {id(ds.ods[ds.pcs.objects[0].object_id].rle_data) for ds in PGSParser.iter_display_sets(data, streamed)}
+		self.assertEqual(1, len(buffers))
+		self.assertEqual(4, streamed.objects)
+
+	def test_clear(self):
+		store = PGSObjectStore()
+		for rle_data in (b'\x01\x00\x00', b'\x01\x00\x00'):
+			store.intern(ODSSegment(0, 0, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 1, 1, rle_data))
+		store.encode(np.ones((1, 1), dtype=np.uint8))
+		store.clear()
+		self.assertEqual((0, 0, 0, 0, 0), (len(store), store.objects, store.total_bytes, store.encoded, store.encoded_unique))
+		store.intern(ODSSegment(0, 0, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 1, 1, b'\x02\x00\x00'))
+		self.assertEqual(1, len(store))
+		self.assertEqual(1, store.objects)
+		self.assertEqual(1.0, store.dedup_ratio)
+
+	def test_fragmented_objects(self):
+		rle_data = encode_pgs_rle([bytes(range(1, 200))] * 400)
+		segments = []
+		for pts in (0, 100):
+			segments += [
+				PCSSegment(pts, pts, 640, 320, 0x10, 0, PCSState.EPOCH_START, False, 0, [PCSObject(0, 0, 0, 0)]),
+				WDSSegment(pts, pts, [WDSWindow(0, 0, 0, 199, 400)]),
+				PDSSegment(pts, pts, 0, 0, [PDSPalette(1, 255, 128, 128, 255)]),
+				ODSSegment(pts, pts, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 199, 400, rle_data),
+				ENDSegment(pts, pts),
+			]
+		store = PGSObjectStore()
+		parsed = PGSParser.read_from_bytes(PGSFile(segments).write(), store)
+		self.assertIs(parsed.display_sets[0].ods[0].rle_data, parsed.display_sets[1].ods[0].rle_data)
+		self.assertEqual(rle_data, parsed.display_sets[0].ods[0].rle_data)
+		self.assertEqual(2.0, store.dedup_ratio)
+
+	def test_save_images_once(self):
+		parsed = PGSParser.read_from_bytes(make_repeating_file(4), PGSObjectStore())
+		cache = PGSImageCache()
+		with tempfile.TemporaryDirectory() as out_dir, tempfile.TemporaryDirectory() as parallel_dir:
+			parsed.save_images(out_dir, cache)
+			parsed.save_images(parallel_dir, workers=2, use_threads=True)
+			self.assertEqual(4, len(os.listdir(out_dir)))
+			self.assertEqual(sorted(os.listdir(out_dir)), sorted(os.listdir(parallel_dir)))
+			contents = set()
+			for directory in (out_dir, parallel_dir):
+				for name in os.listdir(directory):
+					with open(os.path.join(directory, name), 'rb') as f:
+						contents.add(f.read())
+			self.assertEqual(1, len(contents))
+		self.assertEqual(1, cache.misses)
+
+	def test_encode(self):
+		store = PGSObjectStore()
+		indexes = np.arange(64, dtype=np.uint8).reshape(8, 8)
+		first = store.encode(indexes)
+		self.assertEqual(encode_pgs_rle_array(indexes), first)
+		self.assertIs(first, store.encode(indexes.copy()))
+		self.assertEqual((2, 1), (store.encoded, store.encoded_unique))
+
+		# objects with the same content get the encoded buffer
+		ods = ODSSegment(0, 0, 5, 0, ODSPositionFlag.FIRST_AND_LAST, 8, 8, bytes(first))
+		self.assertIs(first, store.intern(ods).rle_data)
@@ -1,5 +1,14 @@
 import unittest
-from pgs import PGSParser, decode_pgs_rle, encode_pgs_rle
+from pgs import (
+	PGSParser, PGSParserException, PGSFile, PGSIO, PGSWriter, PGSIndex, PGSImageCache, decode_pgs_rle, encode_pgs_rle, segment_to_pil,
+	PCSSegment, PCSObject, PCSState, WDSSegment, WDSWindow, PDSSegment, PDSPalette, ODSSegment, ODSPositionFlag, ENDSegment
+)
+import numpy as np
+from PIL import Image
+from io import BytesIO
+import tempfile
+import os
+from tests.helpers import ChunkedStream, make_repeating_file, make_simple_display_set
 from pathlib import Path
 
 class TestParser(unittest.TestCase):
@@ -23,4 +32,151 @@ class TestParser(unittest.TestCase):
 		rle_data = parsed.display_sets[0].ods[0].rle_data
 		parsed.display_sets[0].ods[0].rle_data = encode_pgs_rle(decode_pgs_rle(rle_data))
 		rewritten = parsed.write()
-		self.assertEqual(contents, rewritten)
\ No newline at end of file
+		self.assertEqual(contents, rewritten)
+
+	def test_read_from_file(self):
+		with open(Path(__file__).parent / 'simple.sup', 'rb') as f:
+			contents = f.read()
+		parsed = PGSParser.read_from_file(Path(__file__).parent / 'simple.sup')
+		self.assertEqual(contents, parsed.write())
+
+	def test_iter_display_sets(self):
+		with open(Path(__file__).parent / 'simple.sup', 'rb') as f:
+			contents = f.read()
+		with PGSIO() as writer:
+			for ds in PGSParser.iter_display_sets(ChunkedStream(contents, 1000)):
+				ds.write(writer)
+			writer.seek(0)
+			self.assertEqual(contents, writer.read())
+
+	def test_writer(self):
+		with open(Path(__file__).parent / 'simple.sup', 'rb') as f:
+			contents = f.read()
+		out = BytesIO()
+		with PGSWriter(out) as writer:
+			writer.write_all(PGSParser.iter_display_sets(contents))
+			self.assertEqual(len(contents), writer.tell())
+		self.assertEqual(contents, out.getvalue())
+
+	def test_save_images_parallel(self):
+		parsed = PGSParser.read_from_file(Path(__file__).parent / 'simple.sup')
+		with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as thread_dir, tempfile.TemporaryDirectory() as process_dir:
+			parsed.save_images(serial_dir)
+			parsed.save_images(thread_dir, workers=2, use_threads=True)
+			# the process pool waits on the oldest job after every job it hands out
+			parsed.save_images(process_dir, workers=2, max_in_flight=1)
+			for parallel_dir in (thread_dir, process_dir):
+				self.assertEqual(sorted(os.listdir(serial_dir)), sorted(os.listdir(parallel_dir)))
+				for name in os.listdir(serial_dir):
+					with open(os.path.join(serial_dir, name), 'rb') as a, open(os.path.join(parallel_dir, name), 'rb') as b:
+						self.assertEqual(a.read(), b.read())
+
+	def test_pds_palette_array(self):
+		parsed = PGSParser.read_from_file(Path(__file__).parent / 'simple.sup')
+		pds = parsed.display_sets[0].pds[0]
+		palette_array = pds.palette_array
+		self.assertEqual(np.uint8, palette_array.dtype)
+		self.assertEqual(5, palette_array.shape[1])
+
+		# the objects are only created when asked for and match the array
+		palettes = pds.palettes
+		self.assertEqual(palette_array.tolist(), [[p.id, p.lum, p.cr, p.cb, p.alpha] for p in palettes])
+
+		# once created, changes to the objects are what gets written
+		palettes[0].alpha = 0x12
+		self.assertEqual(0x12, pds.palette_array[0, 4])
+		with PGSIO() as writer:
+			pds.write(writer)
+			writer.seek(2)
+			self.assertEqual(0x12, writer.read()[4])
+
+	def test_pds_from_list(self):
+		pds = PDSSegment(0, 0, 0, 0, [PDSPalette(3, 1, 2, 4, 5)])
+		self.assertEqual([[3, 1, 2, 4, 5]], pds.palette_array.tolist())
+		self.assertEqual(7, pds.get_segment_length())
+
+	def test_ods_to_rgba(self):
+		parsed = PGSParser.read_from_file(Path(__file__).parent / 'simple.sup')
+		ds = parsed.display_sets[0]
+		palette = segment_to_pil(ds.pds[0])
+		ods = ds.ods[0]
+		with ods.get_image(palette) as img, img.convert('RGBA') as rgba:
+			expected = np.array(rgba, dtype=np.uint8)
+		self.assertTrue(np.array_equal(expected, ods.to_rgba(palette)))
+
+		# a bigger buffer gets reused for the result
+		buffer = np.empty(ods.width * ods.height * 4 + 16, dtype=np.uint8)
+		rgba = ods.to_rgba(palette, out=buffer)
+		self.assertTrue(np.shares_memory(buffer, rgba))
+		self.assertTrue(np.array_equal(expected, rgba))
+		with self.assertRaises(ValueError):
+			ods.to_rgba(palette, out=np.empty(4, dtype=np.uint8))
+
+	def test_recover(self):
+		data = make_repeating_file(5)
+		expected = PGSParser.read_from_bytes(data)
+		self.assertEqual([], PGSParser.read_from_bytes(data, recover=True).skipped_ranges)
+		entries = PGSIndex.build(data).entries
+
+		# break the segment after the PCS of the second display set and cut the last one short
+		(start, end) = (int(entries[1]['start']), int(entries[1]['end']))
+		damaged = bytearray(data[:int(entries[-1]['end']) - 1])
+		damaged[start + 13 + int.from_bytes(data[start + 11:start + 13], 'big')] = 0
+		with self.assertRaises(PGSParserException):
+			PGSParser.read_from_bytes(damaged)
+
+		recovered = PGSParser.read_from_bytes(damaged, recover=True)
+		self.assertEqual([(start, end), (int(entries[-1]['start']), len(damaged))], recovered.skipped_ranges)
+		kept = [ds for ds in expected.display_sets if ds.id not in (1, len(entries) - 1)]
+		self.assertEqual([ds.pcs.pts for ds in kept], [ds.pcs.pts for ds in recovered.display_sets])
+		self.assertEqual(
+			[ods.rle_data for ds in kept for ods in ds.ods.values()],
+			[ods.rle_data for ds in recovered.display_sets for ods in ds.ods.values()]
+		)
+
+		# garbage in front of the data
+		recovered = PGSParser.read_from_bytes(b'xxPGxx' + data, recover=True)
+		self.assertEqual([(0, 6)], recovered.skipped_ranges)
+		self.assertEqual(len(expected.display_sets), len(recovered.display_sets))
+
+	def test_recover_normal_display_sets(self):
+		# only the first display set starts an epoch, the others have to be resync points too
+		states = [PCSState.EPOCH_START, PCSState.NORMAL, PCSState.NORMAL, PCSState.EPOCH_CONTINUE, PCSState.NORMAL]
+		segments = []
+		for (i, state) in enumerate(states):
+			segments += make_simple_display_set(i * 100, state)
+		data = PGSFile(segments).write()
+		entries = PGSIndex.build(data).entries
+
+		# break the WDS of the first display set
+		damaged = bytearray(data)
+		damaged[int(entries[0]['start']) + 13 + 19] = 0
+		recovered = PGSParser.read_from_bytes(damaged, recover=True)
+		self.assertEqual([(0, int(entries[1]['start']))], recovered.skipped_ranges)
+		self.assertEqual([100, 200, 300, 400], [ds.pcs.pts for ds in recovered.display_sets])
+
+	def test_save_images_palette_updates(self):
+		ods = ODSSegment(0, 0, 0, 0, ODSPositionFlag.FIRST_AND_LAST, 4, 2, encode_pgs_rle([b'\x01' * 4] * 2))
+		window = WDSWindow(0, 0, 0, 4, 2)
+		segments = [
+			PCSSegment(0, 0, 64, 32, 0x10, 0, PCSState.EPOCH_START, False, 0, [PCSObject(0, 0, 0, 0)]),
+			WDSSegment(0, 0, [window]),
+			PDSSegment(0, 0, 0, 0, [PDSPalette(1, 255, 128, 128, 255)]),
+			ods,
+			ENDSegment(0, 0),
+			PCSSegment(90, 90, 64, 32, 0x10, 1, PCSState.NORMAL, True, 0, [PCSObject(0, 0, 0, 0)]),
+			WDSSegment(90, 90, [window]),
+			PDSSegment(90, 90, 0, 1, [PDSPalette(1, 255, 128, 128, 16)]),
+			ENDSegment(90, 90),
+		]
+		parsed = PGSFile(segments)
+		cache = PGSImageCache()
+		with tempfile.TemporaryDirectory() as out_dir:
+			parsed.save_images(out_dir, cache)
+			self.assertEqual(['0-0 - 00.00.000.png'], os.listdir(out_dir))
+			parsed.save_images(out_dir, cache, palette_updates=True)
+			self.assertEqual(['0-0 - 00.00.000.png', '1-0 - 00.00.001.png'], sorted(os.listdir(out_dir)))
+			with Image.open(os.path.join(out_dir, '1-0 - 00.00.001.png')) as img, img.convert('RGBA') as rgba:
+				self.assertTrue((np.array(rgba)[..., 3] == 16).all())
+		# the object was only decoded once
+		self.assertEqual(1, cache.misses)
@@ -0,0 +1,61 @@
+import unittest
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+from pgs import *
+from tests.helpers import make_repeating_file
+
+
+def flip_and_pad(indexes: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	# module level so it can be sent to a process pool
+	return np.pad(indexes[:, ::-1], 1)
+
+def fail(indexes: np.ndarray, palette: np.ndarray) -> np.ndarray:
+	raise RuntimeError('transform failed')
+
+class TestPipeline(unittest.TestCase):
+
+
+	def check_transformed(self, parsed: PGSFile, original: PGSFile):
+		for ds, original_ds in zip(parsed.display_sets, original.display_sets):
+			for ods in ds.ods.values():
+				original_ods = original_ds.ods[ods.id]
+				self.assertEqual((original_ods.width + 2, original_ods.height + 2), (ods.width, ods.height))
+				self.assertEqual((2, 2), (ods.w_diff, ods.h_diff))
+				self.assertTrue(np.array_equal(flip_and_pad(original_ods.get_indexes(), None), ods.get_indexes()))
+		# the result is still a valid file
+		self.assertEqual(len(original.display_sets), len(PGSParser.read_from_bytes(parsed.write()).display_sets))
+
+	def test_transform_inline(self):
+		data = make_repeating_file(4)
+		parsed = PGSParser.read_from_bytes(data)
+		self.assertEqual(4, transform_objects(parsed, flip_and_pad))
+		self.check_transformed(parsed, PGSParser.read_from_bytes(data))
+
+	def test_transform_pool(self):
+		data = make_repeating_file(6)
+		for store in (None, PGSObjectStore()):
+			parsed = PGSParser.read_from_bytes(data, store)
+			self.assertEqual(6, transform_objects(parsed, flip_and_pad, workers=2, max_in_flight=2))
+			self.check_transformed(parsed, PGSParser.read_from_bytes(data))
+
+	def test_transform_error(self):
+		parsed = PGSParser.read_from_bytes(make_repeating_file(2))
+		with self.assertRaises(RuntimeError):
+			transform_objects(parsed, fail, workers=2)
+
+	def test_shared_memory_cleanup(self):
+		# the resource tracker runs in its own process, so its complaints only show up on the stderr of a separate interpreter
+		code = '\n'.join((
+			'from pgs import PGSParser, transform_objects',
+			'from tests.helpers import make_repeating_file',
+			'from tests.test_pipeline import flip_and_pad',
+			'if __name__ == "__main__":',
+			# the second run starts with the tracker of this process already running
+			'	for _ in range(2):',
+			'		transform_objects(PGSParser.read_from_bytes(make_repeating_file(6)), flip_and_pad, workers=2, max_in_flight=2)',
+		))
+		result = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent, capture_output=True, text=True, timeout=120)
+		self.assertEqual(0, result.returncode, result.stderr)
+		self.assertEqual('', result.stderr)
@@ -1,5 +1,6 @@
 import unittest
-from pgs import decode_pgs_rle, encode_pgs_rle
+from pgs import decode_pgs_rle, encode_pgs_rle, decode_pgs_rle_array, encode_pgs_rle_array
+import numpy as np
 from pathlib import Path
 
 class TestRLE(unittest.TestCase):
@@ -100,6 +101,16 @@ class TestRLE(unittest.TestCase):
 			' '.join(f'{b:02x}' for b in encoded)
 		)
 
+	def test_encode_int_lines(self):
+		# lines don't have to be byte strings
+		decoded = [[1, 1, 2], [0, 0, 0]]
+		expected = b'\x01\x01\x02\x00\x00' + b'\x00\x03\x00\x00'
+		encoded = encode_pgs_rle(decoded)
+		self.assertEqual(
+			' '.join(f'{b:02x}' for b in expected),
+			' '.join(f'{b:02x}' for b in encoded)
+		)
+
 	def test_encode_0LC(self):
 		decoded = [b'555']
 		expected = b'\x00' + (0b10 << 6 | 3).to_bytes(1, 'big') + b'5\x00\x00'
@@ -130,4 +141,54 @@ class TestRLE(unittest.TestCase):
 		self.assertEqual(
 			' '.join(f'{b:02x}' for b in expected),
 			' '.join(f'{b:02x}' for b in rewritten)
-		)
\ No newline at end of file
+		)
+
+
+
+	def test_decode_array(self):
+		encoded = \
+			b'\x00\xa2\xff\x04\x05\x00\x84\x02\x05\x04\x00\xc1\x54\xff\x04\x05\x00\x85\x02\x05\x04\x00\xc0\x57\xff\x00\x00' \
+			+ b'\x00\xa2\xff\x05\x06\x00\x84\x03\x07\x02\x04\x00\xc1\x53\xff\x05\x06\x00\x85\x03\x06\x05\x00\xc0\x57\xff\x00\x00'
+		lines = decode_pgs_rle(encoded)
+		expected = np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), -1)
+		decoded = decode_pgs_rle_array(encoded, expected.shape[1], expected.shape[0])
+		self.assertEqual(np.uint8, decoded.dtype)
+		self.assertTrue(np.array_equal(expected, decoded))
+
+	def test_decode_array_zero_bytes_in_codes(self):
+		# 0x00 bytes that are lengths or colors inside a code aren't the start of an other code
+		encoded = b'\x00\x41\x00' + b'\x00\x83\x00' + b'\x05' + b'\x00\xc1\x00\x00' + b'\x00\x00'
+		lines = decode_pgs_rle(encoded)
+		expected = np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), -1)
+		decoded = decode_pgs_rle_array(encoded, expected.shape[1], expected.shape[0])
+		self.assertTrue(np.array_equal(expected, decoded))
+
+	def test_decode_array_uneven_lines(self):
+		# short lines are padded with palette 0, long lines are truncated
+		encoded = b'\x00\x82\x05\x00\x00' + b'\x00\x84\x06\x00\x00'
+		expected = np.array([[5, 5, 0], [6, 6, 6]], dtype=np.uint8)
+		decoded = decode_pgs_rle_array(encoded, 3, 2)
+		self.assertTrue(np.array_equal(expected, decoded))
+
+
+	def test_encode_array(self):
+		expected = \
+			b'\x00\xa2\xff\x04\x05\x00\x84\x02\x05\x04\x00\xc1\x54\xff\x04\x05\x00\x85\x02\x05\x04\x00\xc0\x57\xff\x00\x00' \
+			+ b'\x00\xa2\xff\x05\x06\x00\x84\x03\x07\x02\x04\x00\xc1\x53\xff\x05\x06\x00\x85\x03\x06\x05\x00\xc0\x57\xff\x00\x00'
+		lines = decode_pgs_rle(expected)
+		decoded = np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), -1)
+		rewritten = encode_pgs_rle_array(decoded)
+		self.assertEqual(
+			' '.join(f'{b:02x}' for b in expected),
+			' '.join(f'{b:02x}' for b in rewritten)
+		)
+
+	def test_encode_array_long_run(self):
+		# runs longer than 0x3fff are split over multiple codes
+		decoded = np.full((1, 0x3fff + 5), 7, dtype=np.uint8)
+		expected = b'\x00' + (0b11 << 14 | 0x3fff).to_bytes(2, 'big') + b'\x07' + b'\x00\x85\x07' + b'\x00\x00'
+		encoded = encode_pgs_rle_array(decoded)
+		self.assertEqual(
+			' '.join(f'{b:02x}' for b in expected),
+			' '.join(f'{b:02x}' for b in encoded)
+		)
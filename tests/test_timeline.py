@@ -0,0 +1,31 @@
+import unittest
+from pgs import *
+from tests.helpers import make_test_file
+
+
+class TestTimeline(unittest.TestCase):
+
+
+	def check_timeline(self, timeline: PGSTimeline):
+		self.assertEqual([], timeline.at(50))
+		self.assertEqual([], timeline.at(250))
+		self.assertEqual([], timeline.at(1000))
+
+		objects = timeline.at(350)
+		self.assertEqual(1, len(objects))
+		self.assertEqual(0, objects[0].ods.id)
+		self.assertEqual(4, objects[0].ods.width)
+		self.assertEqual(0, objects[0].pds.id)
+		self.assertEqual(10, objects[0].window.x)
+
+		self.assertEqual([(100, 200), (300, 400)], [(e.start, e.end) for e in timeline.overlapping(150, 350)])
+		self.assertEqual([(300, 400)], [(e.start, e.end) for e in timeline.between(150, 350)])
+		self.assertEqual([(200, 300), (300, 400)], [(e.start, e.end) for e in timeline.between(150, 350, include_empty=True)])
+		self.assertEqual([(400, None)], [(e.start, e.end) for e in timeline.overlapping(450, 500, include_empty=True)])
+
+	def test_timeline(self):
+		self.check_timeline(make_test_file().build_timeline())
+
+	def test_lazy_timeline(self):
+		data = make_test_file().write()
+		self.check_timeline(PGSTimeline.from_index(PGSIndex.build(data), data))
@@ -0,0 +1,72 @@
+import unittest
+from pathlib import Path
+from pgs import *
+from tests.helpers import write_segments, make_simple_display_set
+
+
+class TestValidator(unittest.TestCase):
+
+
+	def test_valid(self):
+		path = Path(__file__).parent / 'simple.sup'
+		self.assertEqual([], validate_pgs(path))
+		with open(path, 'rb') as f:
+			self.assertEqual([], validate_pgs(f))
+
+		# fragmented objects
+		(data, _) = write_segments(make_simple_display_set(0, extra=[
+			ODSSegment(0, 0, 1, 0, ODSPositionFlag.FIRST_AND_LAST, 400, 400, encode_pgs_rle([bytes(range(200)) * 2] * 400))
+		]))
+		self.assertEqual([], validate_pgs(data))
+		self.assertEqual(2, len(PGSParser.read_from_bytes(data).display_sets[0].ods))
+
+	def test_findings(self):
+		segments = make_simple_display_set(0)
+		# second display set without its END segment
+		segments += make_simple_display_set(100)[:-1]
+		# third display set with an END segment that has a body and 9 palettes
+		third = make_simple_display_set(200, PCSState.NORMAL, [PDSSegment(200, 200, i, 0, []) for i in range(1, 9)])
+		segments += third
+		(data, offsets) = write_segments(segments)
+		# give the END segment a body
+		end_offset = offsets[-1]
+		data = data[:end_offset + 11] + b'\x00\x01' + b'\x00' + data[end_offset + 13:]
+		findings = validate_pgs(data)
+		# the third display set starts at segment 9, its 9th palette is the last extra PDS
+		self.assertEqual([offsets[9], offsets[-2], end_offset], [finding.offset for finding in findings])
+		self.assertIn('no END segment', findings[0].message)
+		self.assertIn('limit of 8 palettes', findings[1].message)
+		self.assertIn('length of 1', findings[2].message)
+
+		# the parser stops at the first one
+		with self.assertRaises(PGSParserException):
+			PGSParser.read_from_bytes(data)
+
+	def test_fragments(self):
+		ods = ODSSegment(0, 0, 1, 0, ODSPositionFlag.FIRST_AND_LAST, 400, 400, encode_pgs_rle([bytes(range(200)) * 2] * 400))
+		(data, offsets) = write_segments(make_simple_display_set(0, extra=[ods]))
+		# the object is written as several segments, drop the middle one
+		fragment_starts = [offsets[4]]
+		while len(fragment_starts) < 3:
+			fragment_starts.append(fragment_starts[-1] + 13 + int.from_bytes(data[fragment_starts[-1] + 11:fragment_starts[-1] + 13], 'big'))
+		data = data[:fragment_starts[1]] + data[fragment_starts[2]:]
+		findings = validate_pgs(data)
+		self.assertEqual([fragment_starts[1]], [finding.offset for finding in findings])
+		self.assertIn('bytes are missing', findings[0].message)
+
+		# a fragment for an object that was never started
+		(data, offsets) = write_segments(make_simple_display_set(0)[:-1] + [ODSSegment(0, 0, 5, 0, ODSPositionFlag.LAST, 4, 2, b'\x00\x00'), ENDSegment(0, 0)])
+		findings = validate_pgs(data)
+		self.assertEqual([offsets[4]], [finding.offset for finding in findings])
+
+	def test_truncated(self):
+		(data, offsets) = write_segments(make_simple_display_set(0) + make_simple_display_set(100))
+		findings = validate_pgs(data[:offsets[8] + 5])
+		self.assertEqual([offsets[8], offsets[5]], [finding.offset for finding in findings])
+		self.assertIn('truncated', findings[0].message)
+		self.assertIn('no END segment', findings[1].message)
+
+		# the rest of the stream is lost after a bad header
+		findings = validate_pgs(data[:offsets[7]] + b'XX' + data[offsets[7] + 2:])
+		self.assertEqual(2, len(findings))
+		self.assertIn('invalid packet header', findings[0].message)